@@ -12,21 +12,57 @@ backend/data/content/<curriculum_id>/
 │       └── ...
 └── assessments/
     └── <cluster_idx>-<topic_idx>/
-        └── <quiz_version>_<timestamp>.json
+        └── quiz_<quiz_version>_<timestamp_ns>.json
 """
 
-import json
+import asyncio
+import hashlib
+import itertools
 import logging
+import mmap
+import os
+import threading
+import time
+import uuid
+import orjson
+from collections import OrderedDict
 from pathlib import Path
 from typing import Optional
 from datetime import datetime
-from .models import Lesson, Quiz
+from .models import Lesson, LessonSection, Quiz, QuizQuestion
 
 logger = logging.getLogger(__name__)
 
 STORAGE_DIR = Path(__file__).parent.parent / "data"
 CONTENT_DIR = STORAGE_DIR / "content"
 
+# Number of quizzes per quiz directory with the directory mtime it was last checked at,
+# rescanned when the directory changes on disk (e.g. written by another worker)
+_quiz_counts: dict[str, tuple[int, int]] = {}
+_quiz_counts_lock = threading.Lock()
+
+# Files smaller than this are read directly; mapping them costs more than it saves
+_MMAP_MIN_SIZE = 4096
+
+# Parsed lessons/quizzes keyed by file path, stored with the mtime they were read at
+_MEMORY_CACHE_SIZE = 512
+_memory_cache: OrderedDict[str, tuple[int, Lesson | Quiz]] = OrderedDict()
+_memory_cache_lock = threading.Lock()
+
+# Last timestamp handed out for an assessment filename, kept strictly increasing
+_last_assessment_ns = 0
+_assessment_ns_lock = threading.Lock()
+
+# Write stamp per topic (keyed by quiz dir), changed whenever this process writes its quizzes or assessments
+_topic_stamps: dict[str, int] = {}
+_topic_stamp_counter = itertools.count(1)
+_topic_stamps_lock = threading.Lock()
+
+# Directories already created by this process, so saves skip the mkdir syscalls
+# (_write_file recreates one that was removed since)
+_ensured_dirs: set[str] = set()
+_ensured_dirs_lock = threading.Lock()
+
 
 def _get_curriculum_dir(curriculum_id: str) -> Path:
     """Get the content directory for a specific curriculum."""
@@ -48,19 +84,151 @@ def _get_assessment_dir(curriculum_id: str, cluster_index: int, topic_index: int
     return _get_curriculum_dir(curriculum_id) / "assessments" / f"{cluster_index}-{topic_index}"
 
 
+def _read_json(path: str | Path):
+    """Load a JSON file, memory-mapping it when it is large enough to pay off."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < _MMAP_MIN_SIZE:
+            return orjson.loads(f.read())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+            return orjson.loads(view)
+
+
+def _write_file(path: Path, data: bytes) -> None:
+    """Write bytes to a temp file on a raw fd and rename it into place, so readers never see a partial file."""
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except FileNotFoundError:
+        # The directory was removed (e.g. by another worker) after this process created it
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    try:
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _memory_get(path: str, mtime_ns: int) -> Optional[Lesson | Quiz]:
+    """Return a parsed model from memory if it was read from the current file version."""
+    with _memory_cache_lock:
+        entry = _memory_cache.get(path)
+        if entry is None or entry[0] != mtime_ns:
+            return None
+        _memory_cache.move_to_end(path)
+        return entry[1]
+
+
+def _memory_put(path: str, mtime_ns: int, item: Lesson | Quiz) -> None:
+    """Store a parsed model in memory, evicting the least recently used entries."""
+    with _memory_cache_lock:
+        _memory_cache[path] = (mtime_ns, item)
+        _memory_cache.move_to_end(path)
+        while len(_memory_cache) > _MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+
+def _memory_forget(path: str) -> None:
+    """Drop a single file from the memory cache."""
+    with _memory_cache_lock:
+        _memory_cache.pop(path, None)
+
+
+def _memory_forget_dir(prefix: str) -> None:
+    """Drop every file under a directory prefix from the memory cache."""
+    with _memory_cache_lock:
+        for key in [k for k in _memory_cache if k.startswith(prefix)]:
+            del _memory_cache[key]
+
+
+def _ensure_dir(path: Path) -> None:
+    """Create a directory (and parents) once per process."""
+    key = str(path)
+    with _ensured_dirs_lock:
+        if key in _ensured_dirs:
+            return
+    path.mkdir(parents=True, exist_ok=True)
+    with _ensured_dirs_lock:
+        _ensured_dirs.add(key)
+
+
+def _touch_topic(curriculum_id: str, cluster_index: int, topic_index: int) -> None:
+    """Give a topic a fresh write stamp."""
+    key = str(_get_quiz_dir(curriculum_id, cluster_index, topic_index))
+    with _topic_stamps_lock:
+        _topic_stamps[key] = next(_topic_stamp_counter)
+
+
+def _dir_mtime_ns(path: Path) -> int:
+    """Modification time of a directory, 0 if it does not exist."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def get_topic_stamp(curriculum_id: str, cluster_index: int, topic_index: int) -> tuple[int, int, int]:
+    """
+    Token that changes whenever a topic's quizzes or assessments are written or deleted.
+    Combines this process's write stamp with the directory mtimes, so changes made by other processes count too.
+    """
+    quiz_dir = _get_quiz_dir(curriculum_id, cluster_index, topic_index)
+    with _topic_stamps_lock:
+        stamp = _topic_stamps.get(str(quiz_dir), 0)
+    return (
+        stamp,
+        _dir_mtime_ns(quiz_dir),
+        _dir_mtime_ns(_get_assessment_dir(curriculum_id, cluster_index, topic_index))
+    )
+
+
+def _hydrate_lesson(data: dict) -> Lesson:
+    """Build a Lesson from cached data without re-validating it (it was validated before being saved)."""
+    data["sections"] = [LessonSection.model_construct(**s) for s in data["sections"]]
+    return Lesson.model_construct(**data)
+
+
+def _hydrate_quiz(data: dict) -> Quiz:
+    """Build a Quiz from cached data without re-validating it (it was validated before being saved)."""
+    data["questions"] = [QuizQuestion.model_construct(**q) for q in data["questions"]]
+    return Quiz.model_construct(**data)
+
+
 # ============ Lessons ============
 
 def get_cached_lesson(curriculum_id: str, cluster_index: int, topic_index: int) -> Optional[Lesson]:
     """Retrieve a cached lesson if it exists."""
     path = _get_lesson_path(curriculum_id, cluster_index, topic_index)
     
-    if path.exists():
-        try:
-            data = json.loads(path.read_text())
-            logger.info(f"📦 Loaded cached lesson: {curriculum_id}/{cluster_index}-{topic_index}")
-            return Lesson(**data)
-        except (json.JSONDecodeError, Exception) as e:
-            logger.warning(f"Failed to load cached lesson: {e}")
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    
+    return _load_lesson(path, mtime_ns)
+
+
+def _load_lesson(path: Path, mtime_ns: int) -> Optional[Lesson]:
+    """Load a lesson file, reusing the in-memory copy if the file is unchanged."""
+    cached = _memory_get(str(path), mtime_ns)
+    if cached is not None:
+        return cached
+    
+    try:
+        data = _read_json(path)
+        logger.info(f"📦 Loaded cached lesson: {path.parent.parent.name}/{path.stem}")
+        lesson = _hydrate_lesson(data)
+        _memory_put(str(path), mtime_ns, lesson)
+        return lesson
+    except (orjson.JSONDecodeError, Exception) as e:
+        logger.warning(f"Failed to load cached lesson: {e}")
     
     return None
 
@@ -68,20 +236,108 @@ def get_cached_lesson(curriculum_id: str, cluster_index: int, topic_index: int)
 def save_lesson(curriculum_id: str, cluster_index: int, topic_index: int, lesson: Lesson) -> None:
     """Save a lesson to the cache."""
     path = _get_lesson_path(curriculum_id, cluster_index, topic_index)
-    path.parent.mkdir(parents=True, exist_ok=True)
+    _ensure_dir(path.parent)
     
-    path.write_text(json.dumps(lesson.model_dump(), indent=2))
+    _write_file(path, lesson.model_dump_json().encode())
+    _memory_forget(str(path))
     logger.info(f"💾 Cached lesson: {curriculum_id}/{cluster_index}-{topic_index}")
 
 
+# ============ Shared Lessons ============
+# Lessons are also stored by topic identity, so another curriculum covering the same
+# subject, cluster and topic can reuse one instead of generating it again.
+
+def shared_topic_key(subject: str, cluster_name: str, topic_name: str) -> str:
+    """Key for a topic that ignores case and spacing differences between curriculums."""
+    normalized = "\n".join(" ".join(part.lower().split()) for part in (subject, cluster_name, topic_name))
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def _get_shared_lesson_path(key: str) -> Path:
+    """Get the path to a shared lesson file."""
+    return CONTENT_DIR / "_shared" / "lessons" / f"{key}.json"
+
+
+def get_shared_lesson(key: str) -> Optional[Lesson]:
+    """Retrieve a lesson generated for the same topic in any curriculum."""
+    path = _get_shared_lesson_path(key)
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _load_lesson(path, mtime_ns)
+
+
+def save_shared_lesson(key: str, lesson: Lesson) -> None:
+    """Store a lesson under its topic key for reuse by other curriculums."""
+    path = _get_shared_lesson_path(key)
+    _ensure_dir(path.parent)
+    _write_file(path, lesson.model_dump_json().encode())
+    _memory_forget(str(path))
+
+
 # ============ Quizzes ============
 
+def _scan_quiz_count(quiz_dir: Path) -> int:
+    """Count quiz files in a directory with a single scandir pass."""
+    try:
+        with os.scandir(quiz_dir) as entries:
+            return sum(1 for e in entries if e.name.startswith("quiz_") and e.name.endswith(".json"))
+    except FileNotFoundError:
+        return 0
+
+
+def _current_quiz_count(quiz_dir: Path) -> int:
+    """Quiz count for a directory, rescanned only if it changed on disk. Call with _quiz_counts_lock held."""
+    key = str(quiz_dir)
+    mtime_ns = _dir_mtime_ns(quiz_dir)
+    if not mtime_ns:
+        _quiz_counts.pop(key, None)
+        return 0
+    cached = _quiz_counts.get(key)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+    count = _scan_quiz_count(quiz_dir)
+    if cached:
+        # Versions handed out by saves still being written are not on disk yet
+        count = max(count, cached[1])
+    _quiz_counts[key] = (mtime_ns, count)
+    return count
+
+
 def get_quiz_count(curriculum_id: str, cluster_index: int, topic_index: int) -> int:
     """Get the number of quizzes generated for a topic."""
-    quiz_dir = _get_quiz_dir(curriculum_id, cluster_index, topic_index)
-    if not quiz_dir.exists():
-        return 0
-    return len(list(quiz_dir.glob("quiz_*.json")))
+    with _quiz_counts_lock:
+        return _current_quiz_count(_get_quiz_dir(curriculum_id, cluster_index, topic_index))
+
+
+def _scan_names(directory: Path) -> set[str]:
+    """List entry names in a directory, empty if it does not exist."""
+    try:
+        with os.scandir(directory) as entries:
+            return {e.name for e in entries}
+    except FileNotFoundError:
+        return set()
+
+
+def bulk_status(
+    curriculum_id: str, keys: list[tuple[int, int]]
+) -> dict[tuple[int, int], tuple[bool, int]]:
+    """
+    Lesson presence and quiz count for many topics at once.
+    Lessons come from one listing of the lessons directory; quiz counts reuse
+    the in-memory counters and only scan topics that have a quiz directory.
+    """
+    curriculum_dir = _get_curriculum_dir(curriculum_id)
+    lesson_names = _scan_names(curriculum_dir / "lessons")
+    quiz_dirs = _scan_names(curriculum_dir / "quizzes")
+
+    status = {}
+    for ci, ti in keys:
+        name = f"{ci}-{ti}"
+        count = get_quiz_count(curriculum_id, ci, ti) if name in quiz_dirs else 0
+        status[(ci, ti)] = (f"{name}.json" in lesson_names, count)
+    return status
 
 
 def get_cached_quiz(curriculum_id: str, cluster_index: int, topic_index: int, version: int = -1) -> Optional[Quiz]:
@@ -91,39 +347,86 @@ def get_cached_quiz(curriculum_id: str, cluster_index: int, topic_index: int, ve
     """
     quiz_dir = _get_quiz_dir(curriculum_id, cluster_index, topic_index)
     
-    if not quiz_dir.exists():
-        return None
-    
     if version == -1:
         # Get latest quiz
-        quiz_files = sorted(quiz_dir.glob("quiz_*.json"))
-        if not quiz_files:
-            return None
-        path = quiz_files[-1]
-    else:
-        path = quiz_dir / f"quiz_{version}.json"
-        if not path.exists():
+        count = get_quiz_count(curriculum_id, cluster_index, topic_index)
+        if count == 0:
             return None
+        version = count - 1
     
+    path = quiz_dir / f"quiz_{version}.json"
     try:
-        data = json.loads(path.read_text())
-        logger.info(f"📦 Loaded cached quiz: {path.stem}")
-        return Quiz(**data)
-    except (json.JSONDecodeError, Exception) as e:
+        mtime_ns = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    
+    return _load_quiz(path, mtime_ns)
+
+
+def get_latest_quiz(curriculum_id: str, cluster_index: int, topic_index: int) -> tuple[Optional[Quiz], int]:
+    """
+    Retrieve the latest cached quiz together with its version.
+    The count is read once, so the version always matches the quiz returned.
+    """
+    version = get_quiz_count(curriculum_id, cluster_index, topic_index) - 1
+    if version < 0:
+        return None, version
+    return get_cached_quiz(curriculum_id, cluster_index, topic_index, version), version
+
+
+def _load_quiz(path: str | Path, mtime_ns: int) -> Optional[Quiz]:
+    """Load a quiz file, reusing the in-memory copy if the file is unchanged."""
+    cached = _memory_get(str(path), mtime_ns)
+    if cached is not None:
+        return cached
+    
+    try:
+        data = _read_json(path)
+        logger.info(f"📦 Loaded cached quiz: {Path(path).stem}")
+        quiz = _hydrate_quiz(data)
+        _memory_put(str(path), mtime_ns, quiz)
+        return quiz
+    except (orjson.JSONDecodeError, Exception) as e:
         logger.warning(f"Failed to load cached quiz: {e}")
     
     return None
 
 
+def get_all_quiz_versions(curriculum_id: str, cluster_index: int, topic_index: int) -> list[tuple[int, Quiz]]:
+    """Load every quiz version for a topic from a single directory scan, oldest first."""
+    quiz_dir = _get_quiz_dir(curriculum_id, cluster_index, topic_index)
+    try:
+        with os.scandir(quiz_dir) as it:
+            entries = [e for e in it if e.name.startswith("quiz_") and e.name.endswith(".json")]
+    except FileNotFoundError:
+        return []
+    
+    versions = []
+    for entry in entries:
+        try:
+            version = int(entry.name[len("quiz_"):-len(".json")])
+        except ValueError:
+            continue
+        quiz = _load_quiz(entry.path, entry.stat().st_mtime_ns)
+        if quiz:
+            versions.append((version, quiz))
+    versions.sort(key=lambda item: item[0])
+    return versions
+
+
 def save_quiz(curriculum_id: str, cluster_index: int, topic_index: int, quiz: Quiz) -> int:
     """Save a quiz to the cache. Returns the version number."""
     quiz_dir = _get_quiz_dir(curriculum_id, cluster_index, topic_index)
-    quiz_dir.mkdir(parents=True, exist_ok=True)
+    _ensure_dir(quiz_dir)
     
-    version = get_quiz_count(curriculum_id, cluster_index, topic_index)
+    with _quiz_counts_lock:
+        version = _current_quiz_count(quiz_dir)
+        _quiz_counts[str(quiz_dir)] = (_dir_mtime_ns(quiz_dir), version + 1)
     path = quiz_dir / f"quiz_{version}.json"
     
-    path.write_text(json.dumps(quiz.model_dump(), indent=2))
+    _write_file(path, quiz.model_dump_json().encode())
+    _memory_forget(str(path))
+    _touch_topic(curriculum_id, cluster_index, topic_index)
     logger.info(f"💾 Cached quiz v{version}: {curriculum_id}/{cluster_index}-{topic_index}")
     
     return version
@@ -131,6 +434,30 @@ def save_quiz(curriculum_id: str, cluster_index: int, topic_index: int, quiz: Qu
 
 # ============ Assessments ============
 
+def _next_assessment_ns() -> int:
+    """Nanosecond timestamp for a new assessment, unique even for same-tick saves."""
+    global _last_assessment_ns
+    with _assessment_ns_lock:
+        _last_assessment_ns = max(time.time_ns(), _last_assessment_ns + 1)
+        return _last_assessment_ns
+
+
+def _assessment_timestamp(name: str) -> int:
+    """
+    Extract the save time (ns) from an assessment filename.
+    Handles both quiz_<v>_<ns>.json and the older quiz_<v>_<YYYYmmdd_HHMMSS>.json format.
+    """
+    parts = name[:-len(".json")].split("_", 2)
+    if len(parts) < 3:
+        return 0
+    try:
+        if "_" in parts[2]:
+            return int(datetime.strptime(parts[2], "%Y%m%d_%H%M%S").timestamp() * 1_000_000_000)
+        return int(parts[2])
+    except ValueError:
+        return 0
+
+
 def save_assessment(
     curriculum_id: str, 
     cluster_index: int, 
@@ -140,43 +467,69 @@ def save_assessment(
 ) -> None:
     """Save a quiz assessment."""
     assessment_dir = _get_assessment_dir(curriculum_id, cluster_index, topic_index)
-    assessment_dir.mkdir(parents=True, exist_ok=True)
+    _ensure_dir(assessment_dir)
     
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    timestamp = _next_assessment_ns()
     path = assessment_dir / f"quiz_{quiz_version}_{timestamp}.json"
     
-    path.write_text(json.dumps(assessment, indent=2))
+    _write_file(path, orjson.dumps(assessment))
+    _touch_topic(curriculum_id, cluster_index, topic_index)
     logger.info(f"💾 Saved assessment for quiz v{quiz_version}")
 
 
+def _list_assessment_files(assessment_dir: Path) -> list[os.DirEntry]:
+    """List assessment files in a directory, newest first."""
+    try:
+        with os.scandir(assessment_dir) as it:
+            entries = [e for e in it if e.name.startswith("quiz_") and e.name.endswith(".json")]
+    except FileNotFoundError:
+        return []
+    entries.sort(key=lambda e: _assessment_timestamp(e.name), reverse=True)
+    return entries
+
+
+def _load_assessment(entry: os.DirEntry) -> Optional[dict]:
+    """Load a single assessment file, or None if it can't be read."""
+    try:
+        data = _read_json(entry.path)
+        # Ensure quiz_version is present (extract from filename if not in data)
+        # Filename format: quiz_{version}_{timestamp}.json
+        if "quiz_version" not in data:
+            filename = entry.name[:-len(".json")]  # e.g., "quiz_0_1733400000000000000"
+            parts = filename.split("_")
+            if len(parts) >= 2 and parts[0] == "quiz":
+                try:
+                    data["quiz_version"] = int(parts[1])
+                except ValueError:
+                    data["quiz_version"] = 0
+        return data
+    except:
+        return None
+
+
 def get_assessments(curriculum_id: str, cluster_index: int, topic_index: int) -> list[dict]:
     """Get all assessments for a topic, newest first."""
     assessment_dir = _get_assessment_dir(curriculum_id, cluster_index, topic_index)
     
-    if not assessment_dir.exists():
-        return []
-    
     assessments = []
-    for path in sorted(assessment_dir.glob("quiz_*.json"), reverse=True):
-        try:
-            data = json.loads(path.read_text())
-            # Ensure quiz_version is present (extract from filename if not in data)
-            # Filename format: quiz_{version}_{timestamp}.json
-            if "quiz_version" not in data:
-                filename = path.stem  # e.g., "quiz_0_20241205_120000"
-                parts = filename.split("_")
-                if len(parts) >= 2 and parts[0] == "quiz":
-                    try:
-                        data["quiz_version"] = int(parts[1])
-                    except ValueError:
-                        data["quiz_version"] = 0
+    for entry in _list_assessment_files(assessment_dir):
+        data = _load_assessment(entry)
+        if data is not None:
             assessments.append(data)
-        except:
-            pass
     
     return assessments
 
 
+async def get_assessments_async(curriculum_id: str, cluster_index: int, topic_index: int) -> list[dict]:
+    """Get all assessments for a topic, newest first, reading files in parallel threads."""
+    assessment_dir = _get_assessment_dir(curriculum_id, cluster_index, topic_index)
+    
+    entries = await asyncio.to_thread(_list_assessment_files, assessment_dir)
+    results = await asyncio.gather(*(asyncio.to_thread(_load_assessment, e) for e in entries))
+    
+    return [data for data in results if data is not None]
+
+
 # ============ Cleanup ============
 
 def delete_curriculum_content(curriculum_id: str) -> None:
@@ -184,6 +537,22 @@ def delete_curriculum_content(curriculum_id: str) -> None:
     import shutil
     
     curriculum_dir = _get_curriculum_dir(curriculum_id)
+    
+    prefix = str(curriculum_dir) + os.sep
+    with _quiz_counts_lock:
+        for key in [k for k in _quiz_counts if k.startswith(prefix)]:
+            del _quiz_counts[key]
+    _memory_forget_dir(prefix)
+    with _ensured_dirs_lock:
+        _ensured_dirs.difference_update([d for d in _ensured_dirs if d.startswith(prefix)])
+    # Restamp every topic on disk too, not just those written since startup (unwritten ones read as 0)
+    topic_keys = {str(curriculum_dir / "quizzes" / name)
+                  for kind in ("quizzes", "assessments") for name in _scan_names(curriculum_dir / kind)}
+    with _topic_stamps_lock:
+        topic_keys.update(k for k in _topic_stamps if k.startswith(prefix))
+        for key in topic_keys:
+            _topic_stamps[key] = next(_topic_stamp_counter)
+    
     if curriculum_dir.exists():
         shutil.rmtree(curriculum_dir)
         logger.info(f"🗑️ Deleted cached content for: {curriculum_id}")
@@ -1,10 +1,10 @@
-import json
 import logging
-import re
+import time
+import orjson
 from typing import AsyncGenerator
-from anthropic import AsyncAnthropic
 from dotenv import load_dotenv
-from .models import Curriculum, Cluster, Topic
+from .models import Curriculum
+from . import llm_client
 
 # Load environment variables
 load_dotenv()
@@ -17,8 +17,26 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize Anthropic client
-client = AsyncAnthropic()
+# Shared Anthropic client
+client = llm_client.async_client
+
+# Minimum time between "Receiving AI response..." progress events while streaming
+PROGRESS_INTERVAL_SECONDS = 0.1
+
+
+def _extract_fenced_json(text: str) -> str | None:
+    """Return the body of the first markdown code fence (optionally tagged json), or None."""
+    start = text.find("```")
+    if start < 0:
+        return None
+    start += 3
+    if text.startswith("json", start):
+        start += 4
+    end = text.find("```", start)
+    if end < 0:
+        return None
+    return text[start:end].strip()
+
 
 SYSTEM_PROMPT = """You are an expert curriculum designer and educational content organizer. Your task is to analyze a raw list of topics and organize them into a structured learning curriculum.
 
@@ -87,16 +105,18 @@ async def parse_curriculum_with_progress(raw_text: str) -> AsyncGenerator[dict,
                 "role": "user",
                 "content": f"Please organize the following topics into a structured learning curriculum:\n\n{raw_text}"
             }],
-            system=SYSTEM_PROMPT
+            system=[{"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}]
         ) as stream:
             
-            response_text = ""
             progress = 5
-            async for text in stream.text_stream:
-                response_text += text
+            last_yield = time.monotonic()
+            async for _ in stream.text_stream:
                 progress = min(297, progress + 1)
 
-                if progress % 3 == 0:
+                # Throttle updates instead of emitting one per streamed token
+                now = time.monotonic()
+                if now - last_yield >= PROGRESS_INTERVAL_SECONDS:
+                    last_yield = now
                     yield {"status": "processing", "message": "Receiving AI response...", "progress": progress/3}
             
             message = await stream.get_final_message()
@@ -117,12 +137,12 @@ async def parse_curriculum_with_progress(raw_text: str) -> AsyncGenerator[dict,
     
     # Parse the JSON response
     try:
-        curriculum_data = json.loads(response_text)
-    except json.JSONDecodeError:
+        curriculum_data = orjson.loads(response_text)
+    except orjson.JSONDecodeError:
         # Try to extract JSON from the response if it's wrapped in markdown
-        json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', response_text)
-        if json_match:
-            curriculum_data = json.loads(json_match.group(1))
+        fenced = _extract_fenced_json(response_text)
+        if fenced is not None:
+            curriculum_data = orjson.loads(fenced)
         else:
             logger.error(f"❌ Failed to parse JSON from response")
             yield {"status": "error", "message": "Failed to parse curriculum from AI response", "progress": 0}
@@ -130,34 +150,13 @@ async def parse_curriculum_with_progress(raw_text: str) -> AsyncGenerator[dict,
     
     yield {"status": "processing", "message": "Finalizing curriculum...", "progress": 99}
     
-    # Convert to Pydantic models
-    clusters = []
-    for cluster_data in curriculum_data.get("clusters", []):
-        topics = []
-        for topic_data in cluster_data.get("topics", []):
-            topics.append(Topic(
-                name=topic_data["name"],
-                description=topic_data["description"],
-                order=topic_data["order"],
-                prerequisites=topic_data.get("prerequisites", [])
-            ))
-        clusters.append(Cluster(
-            name=cluster_data["name"],
-            description=cluster_data["description"],
-            order=cluster_data["order"],
-            topics=topics
-        ))
-    
-    curriculum = Curriculum(
-        subject=curriculum_data["subject"],
-        description=curriculum_data["description"],
-        clusters=clusters
-    )
+    # Validate straight into Pydantic models
+    curriculum = Curriculum.model_validate(curriculum_data)
     
-    total_topics = sum(len(c.topics) for c in clusters)
+    total_topics = sum(len(c.topics) for c in curriculum.clusters)
     logger.info(f"🎉 Curriculum created successfully!")
     logger.info(f"   Subject: {curriculum.subject}")
-    logger.info(f"   Clusters: {len(clusters)}, Topics: {total_topics}")
+    logger.info(f"   Clusters: {len(curriculum.clusters)}, Topics: {total_topics}")
     
     yield {
         "status": "complete", 
@@ -0,0 +1,40 @@
+"""SQLite connection setup and schema for curriculums and learning progress."""
+import sqlite3
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS curriculums (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    description TEXT NOT NULL,
+    cluster_count INTEGER NOT NULL,
+    topic_count INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS learning (
+    curriculum_id TEXT PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    last_activity TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS progress (
+    curriculum_id TEXT NOT NULL,
+    topic_key TEXT NOT NULL,
+    completed INTEGER NOT NULL,
+    quiz_score INTEGER,
+    completed_at TEXT,
+    PRIMARY KEY (curriculum_id, topic_key)
+);
+"""
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    """Open the database in autocommit mode with WAL journaling and make sure the schema exists."""
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
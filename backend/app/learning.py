@@ -1,177 +1,339 @@
-import json
-import logging
-import re
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from anthropic import Anthropic
+import functools
+import logging
+import os
+import orjson
+from typing import Callable, Optional
 from dotenv import load_dotenv
+from pydantic import TypeAdapter
 from .models import Lesson, LessonSection, Quiz, QuizQuestion
 from . import storage
 from . import content_cache
+from . import llm_client
 
 load_dotenv()
 
 logger = logging.getLogger(__name__)
-client = Anthropic()
+client = llm_client.async_client
+
+# Cap on in-flight LLM calls; tune to the account's rate-limit tier
+_llm_semaphore = asyncio.Semaphore(int(os.getenv("ANTHROPIC_CONCURRENCY", "32")))
+
+# Output token caps per call, sized to each JSON schema and tunable via env vars
+LESSON_PLAN_MAX_TOKENS = int(os.getenv("LESSON_PLAN_MAX_TOKENS", "1024"))
+LESSON_SECTION_MAX_TOKENS = int(os.getenv("LESSON_SECTION_MAX_TOKENS", "1200"))
+LESSON_SUMMARY_MAX_TOKENS = int(os.getenv("LESSON_SUMMARY_MAX_TOKENS", "400"))
+QUIZ_MAX_TOKENS = int(os.getenv("QUIZ_MAX_TOKENS", "1500"))
+ASSESSMENT_MAX_TOKENS = int(os.getenv("ASSESSMENT_MAX_TOKENS", "2000"))
+
+
+# Validate whole lists of quiz questions in one pass instead of model-by-model
+_QUIZ_QUESTIONS_ADAPTER = TypeAdapter(list[QuizQuestion])
 
-# Thread pool for running blocking LLM calls
-_executor = ThreadPoolExecutor(max_workers=4)
+# Generations currently running, so concurrent requests for the same content share one LLM call
+_inflight: dict[tuple, asyncio.Future] = {}
 
 
-def _call_llm_sync(messages: list, system: str = "", max_tokens: int = 4096) -> str:
-    """Synchronous LLM call - runs in thread pool."""
+async def _single_flight(key: tuple, factory):
+    """Run factory() once per key; concurrent callers with the same key await the same result."""
+    future = _inflight.get(key)
+    if future is None:
+        future = asyncio.ensure_future(factory())
+        _inflight[key] = future
+        future.add_done_callback(lambda _: _inflight.pop(key, None))
+    # Shield so one caller disconnecting doesn't cancel the generation for the others
+    return await asyncio.shield(future)
+
+
+async def _call_llm(messages: list, system: str = "", max_tokens: int = 4096) -> str:
+    """Async LLM call - doesn't block the event loop."""
     kwargs = {
         "model": "claude-sonnet-4-20250514",
         "max_tokens": max_tokens,
         "messages": messages
     }
     if system:
-        kwargs["system"] = system
+        # Mark the system prompt for prompt caching; it is identical across calls
+        kwargs["system"] = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
     
-    response = client.messages.create(**kwargs)
+    async with _llm_semaphore:
+        response = await client.messages.create(**kwargs)
     return response.content[0].text
 
 
-async def _call_llm(messages: list, system: str = "", max_tokens: int = 4096) -> str:
-    """Async wrapper for LLM calls - doesn't block the event loop."""
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(
-        _executor,
-        lambda: _call_llm_sync(messages, system, max_tokens)
-    )
+def _extract_fenced_json(text: str) -> str | None:
+    """Return the body of the first markdown code fence (optionally tagged json), or None."""
+    start = text.find("```")
+    if start < 0:
+        return None
+    start += 3
+    if text.startswith("json", start):
+        start += 4
+    end = text.find("```", start)
+    if end < 0:
+        return None
+    return text[start:end].strip()
 
 
 def _parse_json_response(text: str) -> dict:
     """Parse JSON from LLM response, handling markdown code blocks."""
+    # A fenced response can't parse as-is, so strip the fence before the first attempt
+    if text.lstrip().startswith("```"):
+        fenced = _extract_fenced_json(text)
+        if fenced is not None:
+            return orjson.loads(fenced)
     try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', text)
-        if json_match:
-            return json.loads(json_match.group(1))
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
+        fenced = _extract_fenced_json(text)
+        if fenced is not None:
+            return orjson.loads(fenced)
         raise ValueError("Failed to parse JSON from response")
 
 
-async def generate_lesson(curriculum_id: str, cluster_index: int, topic_index: int) -> Lesson:
-    """Generate an AI lesson for a specific topic, using cache if available."""
-    
-    # Check cache first
-    cached = content_cache.get_cached_lesson(curriculum_id, cluster_index, topic_index)
-    if cached:
-        return cached
-    
-    # Get the curriculum and topic
-    record = storage.get_curriculum(curriculum_id)
-    if not record:
-        raise ValueError("Curriculum not found")
-    
-    curriculum = record["curriculum"]
-    cluster = curriculum["clusters"][cluster_index]
-    topic = cluster["topics"][topic_index]
-    
-    logger.info(f"📚 Generating lesson for: {topic['name']}")
-    
-    prompt = f"""Create a comprehensive lesson for learning the following topic:
+@functools.lru_cache(maxsize=512)
+def _topic_context(subject: str, cluster_name: str, topic_name: str, description: str, prerequisites: tuple[str, ...]) -> str:
+    """The topic block shared by every lesson and quiz prompt for a topic."""
+    return f"""Subject: {subject}
+Cluster: {cluster_name}
+Topic: {topic_name}
+Topic Description: {description}
+Prerequisites: {', '.join(prerequisites) or 'None'}"""
 
-Subject: {curriculum['subject']}
-Cluster: {cluster['name']}
-Topic: {topic['name']}
-Topic Description: {topic['description']}
-Prerequisites: {', '.join(topic.get('prerequisites', [])) or 'None'}
 
-Create a well-structured lesson that:
+def _topic_context_for(curriculum: dict, cluster: dict, topic: dict) -> str:
+    """Look up the cached topic block for a curriculum topic."""
+    return _topic_context(
+        curriculum['subject'], cluster['name'], topic['name'], topic['description'],
+        tuple(topic.get('prerequisites', []))
+    )
 
-1. **Starts with the "Why"** - Begin with an engaging introduction that explains:
+
+# Static instructions go in the (prompt-cached) system prompt; prompts carry only the topic details
+LESSON_PLAN_SYSTEM = """You plan comprehensive lessons for learning a topic.
+
+The lesson should:
+
+1. **Start with the "Why"** - Write an engaging introduction that explains:
    - What PROBLEM or challenge this concept was developed to solve
    - The historical or practical context (what did people struggle with before this existed?)
    - Why this matters in the real world
 
-2. **Explains the "What"** - Break down the concept into 3-4 digestible sections that:
-   - Explain the core concept clearly with concrete examples
-   - Use analogies to make abstract ideas tangible
-   - Include key points that crystallize the essential knowledge
+2. **Explain the "What"** - Outline 3-4 digestible sections that build on each other, covering:
+   - The core concept with concrete examples and analogies
+   - Why this solution is elegant or effective, and what makes it better than naive approaches
+   - How to recognize when to apply it
 
-3. **Shows the "Elegance"** - Help the learner appreciate:
-   - Why this solution is elegant or effective
-   - How it addresses the original problem in a clever way
-   - What makes it better than naive approaches
-
-4. **Ends with practical application** - Summarize with:
-   - How to recognize when to apply this concept
-   - Common use cases and patterns
+Each section will be written separately from your outline, so make each brief specific.
 
 Respond with JSON in this exact format:
-{{
-    "topic_name": "{topic['name']}",
+{
+    "topic_name": "The topic name, as given",
     "introduction": "An engaging intro that sets up the PROBLEM this concept solves and why it matters...",
     "sections": [
-        {{
+        {
             "title": "Section Title",
-            "content": "Detailed explanation with examples, analogies, and practical insights...",
-            "key_points": ["Point 1", "Point 2", "Point 3"]
-        }}
+            "outline": "What this section covers, which examples/analogies to use, and how it connects to the other sections"
+        }
     ],
-    "summary": "A concise summary covering when and how to apply this knowledge...",
     "estimated_time_minutes": 15
-}}
+}
 
 Respond ONLY with the JSON, no additional text."""
 
-    response_text = await _call_llm([{"role": "user", "content": prompt}])
-    logger.info(f"✅ Lesson generated for: {topic['name']}")
-    
-    data = _parse_json_response(response_text)
+LESSON_SECTION_SYSTEM = """You write one section of a lesson at a time, following the lesson's plan.
+
+Explain the concept clearly with concrete examples, use analogies to make abstract ideas tangible,
+and stay within the section's brief (the other sections are written separately).
+
+Respond with JSON in this exact format:
+{
+    "title": "The section title, as given",
+    "content": "Detailed explanation with examples, analogies, and practical insights...",
+    "key_points": ["Point 1", "Point 2", "Point 3"]
+}
+
+Respond ONLY with the JSON, no additional text."""
+
+LESSON_SUMMARY_SYSTEM = """You write the closing summary of a lesson.
+
+Summarize how to recognize when to apply the concept, and its common use cases and patterns.
+
+Respond with JSON in this exact format:
+{
+    "summary": "A concise summary covering when and how to apply this knowledge..."
+}
+
+Respond ONLY with the JSON, no additional text."""
+
+
+def _lesson_plan_prompt(curriculum: dict, cluster: dict, topic: dict) -> str:
+    """Prompt for the lesson outline: introduction plus 3-4 section briefs."""
+    return f"""Plan a lesson for the following topic:
+
+{_topic_context_for(curriculum, cluster, topic)}"""
+
+
+def _lesson_section_prompt(curriculum: dict, cluster: dict, topic: dict, plan: dict, section: dict) -> str:
+    """Prompt for writing a single lesson section from the plan."""
+    outline = "\n".join(f"- {s['title']}" for s in plan["sections"])
+    return f"""Write one section of the lesson for the following topic:
+
+{_topic_context_for(curriculum, cluster, topic)}
+Lesson introduction: {plan['introduction']}
+All sections in this lesson:
+{outline}
+
+Section to write: {section['title']}
+Brief: {section.get('outline', '')}"""
+
+
+def _lesson_summary_prompt(curriculum: dict, cluster: dict, topic: dict, section_titles: list[str]) -> str:
+    """Prompt for the closing summary of a lesson."""
+    return f"""Write the closing summary of the lesson for the following topic:
+
+{_topic_context_for(curriculum, cluster, topic)}
+Sections covered: {', '.join(section_titles)}"""
+
+
+async def generate_lesson(curriculum_id: str, cluster_index: int, topic_index: int) -> Lesson:
+    """Generate an AI lesson for a specific topic, using cache if available."""
     
-    lesson = Lesson(
-        topic_name=data["topic_name"],
-        introduction=data["introduction"],
-        sections=[LessonSection(**s) for s in data["sections"]],
-        summary=data["summary"],
-        estimated_time_minutes=data.get("estimated_time_minutes", 15)
+    # Check the cache while the curriculum loads, so a miss doesn't wait on two reads
+    cached, record = await asyncio.gather(
+        asyncio.to_thread(content_cache.get_cached_lesson, curriculum_id, cluster_index, topic_index),
+        asyncio.to_thread(storage.get_curriculum, curriculum_id)
     )
+    if cached:
+        return cached
     
-    # Cache the lesson
-    content_cache.save_lesson(curriculum_id, cluster_index, topic_index, lesson)
+    if not record:
+        raise ValueError("Curriculum not found")
     
-    return lesson
+    curriculum = record["curriculum"]
+    cluster = curriculum["clusters"][cluster_index]
+    topic = cluster["topics"][topic_index]
+    
+    return await _single_flight(
+        ("lesson", curriculum_id, cluster_index, topic_index),
+        lambda: _create_lesson(curriculum_id, cluster_index, topic_index, curriculum, cluster, topic)
+    )
 
 
-async def generate_quiz(curriculum_id: str, cluster_index: int, topic_index: int, force_new: bool = False) -> tuple[Quiz, int]:
+async def generate_lesson_events(curriculum_id: str, cluster_index: int, topic_index: int):
     """
-    Generate a quiz to assess mastery of a topic.
-    Returns (Quiz, version_number).
-    If force_new=True, generates a new quiz even if one exists.
+    Generate a lesson, yielding events as it is written: the plan, each section
+    as soon as it is ready, then the complete lesson. Cached lessons (and lessons
+    another request is already writing) arrive as a single complete event.
     """
+    cached, record = await asyncio.gather(
+        asyncio.to_thread(content_cache.get_cached_lesson, curriculum_id, cluster_index, topic_index),
+        asyncio.to_thread(storage.get_curriculum, curriculum_id)
+    )
+    if cached:
+        yield {"type": "complete", "lesson": cached.model_dump()}
+        return
     
-    # Check cache first (unless forcing new)
-    if not force_new:
-        cached = content_cache.get_cached_quiz(curriculum_id, cluster_index, topic_index)
-        if cached:
-            version = content_cache.get_quiz_count(curriculum_id, cluster_index, topic_index) - 1
-            return cached, version
-    
-    record = storage.get_curriculum(curriculum_id)
     if not record:
         raise ValueError("Curriculum not found")
     
     curriculum = record["curriculum"]
     cluster = curriculum["clusters"][cluster_index]
     topic = cluster["topics"][topic_index]
+    events: asyncio.Queue = asyncio.Queue()
     
-    # Get count of existing quizzes to make new ones different
-    existing_count = content_cache.get_quiz_count(curriculum_id, cluster_index, topic_index)
+    async def run():
+        try:
+            return await _single_flight(
+                ("lesson", curriculum_id, cluster_index, topic_index),
+                lambda: _create_lesson(
+                    curriculum_id, cluster_index, topic_index, curriculum, cluster, topic,
+                    on_progress=events.put_nowait
+                )
+            )
+        finally:
+            events.put_nowait(None)
     
-    logger.info(f"📝 Generating quiz v{existing_count} for: {topic['name']}")
+    generation = asyncio.ensure_future(run())
+    while (event := await events.get()) is not None:
+        yield event
+    yield {"type": "complete", "lesson": (await generation).model_dump()}
+
+
+async def _create_lesson(
+    curriculum_id: str,
+    cluster_index: int,
+    topic_index: int,
+    curriculum: dict,
+    cluster: dict,
+    topic: dict,
+    on_progress: Optional[Callable[[dict], None]] = None
+) -> Lesson:
+    """Generate a lesson with the LLM and cache it, reporting the plan and each section to on_progress."""
+    # Another curriculum may already have a lesson for this exact topic
+    shared_key = content_cache.shared_topic_key(curriculum["subject"], cluster["name"], topic["name"])
+    shared = await asyncio.to_thread(content_cache.get_shared_lesson, shared_key)
+    if shared:
+        logger.info("♻️ Reusing shared lesson for: %s", topic['name'])
+        await asyncio.to_thread(content_cache.save_lesson, curriculum_id, cluster_index, topic_index, shared)
+        return shared
     
-    variation_note = ""
-    if existing_count > 0:
-        variation_note = f"\n\nIMPORTANT: This is quiz attempt #{existing_count + 1}. Create DIFFERENT questions than previous quizzes to test the concept from new angles."
+    logger.info("📚 Generating lesson for: %s", topic['name'])
     
-    prompt = f"""Create a quiz to assess understanding of this topic:
+    # Plan the lesson first, then write every section and the summary in parallel
+    plan = _parse_json_response(await _call_llm(
+        [{"role": "user", "content": _lesson_plan_prompt(curriculum, cluster, topic)}],
+        system=LESSON_PLAN_SYSTEM,
+        max_tokens=LESSON_PLAN_MAX_TOKENS
+    ))
+    section_titles = [s["title"] for s in plan["sections"]]
+    if on_progress:
+        on_progress({
+            "type": "plan",
+            "topic_name": plan["topic_name"],
+            "introduction": plan["introduction"],
+            "section_titles": section_titles
+        })
+    
+    async def write_section(index: int, section: dict) -> LessonSection:
+        text = await _call_llm(
+            [{"role": "user", "content": _lesson_section_prompt(curriculum, cluster, topic, plan, section)}],
+            system=LESSON_SECTION_SYSTEM,
+            max_tokens=LESSON_SECTION_MAX_TOKENS
+        )
+        written = LessonSection.model_validate(_parse_json_response(text))
+        if on_progress:
+            on_progress({"type": "section", "index": index, "section": written.model_dump()})
+        return written
+    
+    *sections, summary_text = await asyncio.gather(
+        *(write_section(i, s) for i, s in enumerate(plan["sections"])),
+        _call_llm(
+            [{"role": "user", "content": _lesson_summary_prompt(curriculum, cluster, topic, section_titles)}],
+            system=LESSON_SUMMARY_SYSTEM,
+            max_tokens=LESSON_SUMMARY_MAX_TOKENS
+        )
+    )
+    logger.info("✅ Lesson generated for: %s (%d sections)", topic['name'], len(sections))
+    
+    lesson = Lesson(
+        topic_name=plan["topic_name"],
+        introduction=plan["introduction"],
+        sections=sections,
+        summary=_parse_json_response(summary_text)["summary"],
+        estimated_time_minutes=plan.get("estimated_time_minutes", 15)
+    )
+    
+    # Cache the lesson for this curriculum and for reuse by others
+    await asyncio.gather(
+        asyncio.to_thread(content_cache.save_lesson, curriculum_id, cluster_index, topic_index, lesson),
+        asyncio.to_thread(content_cache.save_shared_lesson, shared_key, lesson)
+    )
+    
+    return lesson
 
-Subject: {curriculum['subject']}
-Topic: {topic['name']}
-Description: {topic['description']}{variation_note}
+
+QUIZ_SYSTEM = """You write quizzes that assess mastery of a topic.
 
 Create 5 multiple-choice questions that:
 1. Test conceptual understanding, not just memorization
@@ -180,37 +342,121 @@ Create 5 multiple-choice questions that:
 4. Have plausible distractors that represent common misconceptions
 
 Respond with JSON in this exact format:
-{{
-    "topic_name": "{topic['name']}",
+{
+    "topic_name": "The topic name, as given",
     "questions": [
-        {{
+        {
             "question": "The question text?",
             "options": ["Option A", "Option B", "Option C", "Option D"],
             "correct_index": 0,
             "explanation": "Brief explanation of the correct answer..."
-        }}
+        }
     ]
-}}
+}
 
 Respond ONLY with the JSON, no additional text."""
 
-    response_text = await _call_llm([{"role": "user", "content": prompt}], max_tokens=2048)
-    logger.info(f"✅ Quiz generated for: {topic['name']}")
+
+async def generate_quiz(curriculum_id: str, cluster_index: int, topic_index: int, force_new: bool = False) -> tuple[Quiz, int]:
+    """
+    Generate a quiz to assess mastery of a topic.
+    Returns (Quiz, version_number).
+    If force_new=True, generates a new quiz even if one exists.
+    """
+    
+    # Check cache (unless forcing new) while the curriculum loads
+    if force_new:
+        record = await asyncio.to_thread(storage.get_curriculum, curriculum_id)
+    else:
+        (cached, version), record = await asyncio.gather(
+            asyncio.to_thread(content_cache.get_latest_quiz, curriculum_id, cluster_index, topic_index),
+            asyncio.to_thread(storage.get_curriculum, curriculum_id)
+        )
+        if cached:
+            return cached, version
+    
+    if not record:
+        raise ValueError("Curriculum not found")
+    
+    curriculum = record["curriculum"]
+    cluster = curriculum["clusters"][cluster_index]
+    topic = cluster["topics"][topic_index]
+    
+    # Get count of existing quizzes to make new ones different
+    existing_count = content_cache.get_quiz_count(curriculum_id, cluster_index, topic_index)
+    
+    return await _single_flight(
+        ("quiz", curriculum_id, cluster_index, topic_index, existing_count),
+        lambda: _create_quiz(curriculum_id, cluster_index, topic_index, curriculum, cluster, topic, existing_count)
+    )
+
+
+async def _create_quiz(
+    curriculum_id: str,
+    cluster_index: int,
+    topic_index: int,
+    curriculum: dict,
+    cluster: dict,
+    topic: dict,
+    existing_count: int
+) -> tuple[Quiz, int]:
+    """Generate a new quiz version with the LLM and cache it."""
+    logger.info("📝 Generating quiz v%d for: %s", existing_count, topic['name'])
+    
+    variation_note = ""
+    if existing_count > 0:
+        variation_note = f"\n\nIMPORTANT: This is quiz attempt #{existing_count + 1}. Create DIFFERENT questions than previous quizzes to test the concept from new angles."
+    
+    prompt = f"""Create a quiz to assess understanding of this topic:
+
+{_topic_context_for(curriculum, cluster, topic)}{variation_note}"""
+
+    response_text = await _call_llm([{"role": "user", "content": prompt}], system=QUIZ_SYSTEM, max_tokens=QUIZ_MAX_TOKENS)
+    logger.info("✅ Quiz generated for: %s", topic['name'])
     
     data = _parse_json_response(response_text)
     
     quiz = Quiz(
         topic_name=data["topic_name"],
-        questions=[QuizQuestion(**q) for q in data["questions"]],
+        questions=_QUIZ_QUESTIONS_ADAPTER.validate_python(data["questions"]),
         passing_score=80
     )
     
     # Cache the quiz
-    version = content_cache.save_quiz(curriculum_id, cluster_index, topic_index, quiz)
+    version = await asyncio.to_thread(content_cache.save_quiz, curriculum_id, cluster_index, topic_index, quiz)
     
     return quiz, version
 
 
+async def generate_lesson_and_quiz(curriculum_id: str, cluster_index: int, topic_index: int) -> tuple[Lesson, Quiz, int]:
+    """
+    Generate (or load) a topic's lesson and latest quiz together.
+    Both run concurrently, so starting a topic costs one round trip instead of two.
+    Returns (Lesson, Quiz, quiz_version).
+    """
+    lesson, (quiz, version) = await asyncio.gather(
+        generate_lesson(curriculum_id, cluster_index, topic_index),
+        generate_quiz(curriculum_id, cluster_index, topic_index)
+    )
+    return lesson, quiz, version
+
+
+def _score(answers: list[int], correct_indices: list[int]) -> tuple[int, int]:
+    """Return (correct, total) from parallel lists of chosen and correct option indices."""
+    return sum(a == c for a, c in zip(answers, correct_indices)), len(correct_indices)
+
+
+def score_answers(quiz: Quiz, answers: list[int]) -> tuple[int, int]:
+    """Return (correct_count, score percentage) for a set of quiz answers."""
+    correct_count, total = _score(answers, [question.correct_index for question in quiz.questions])
+    return correct_count, int((correct_count / total) * 100)
+
+
+def answer_text(question: QuizQuestion, answer: int) -> str:
+    """The text of the chosen option, or "No answer" when the index is out of range."""
+    return question.options[answer] if 0 <= answer < len(question.options) else "No answer"
+
+
 async def assess_quiz_answers(
     curriculum_id: str,
     cluster_index: int,
@@ -221,34 +467,31 @@ async def assess_quiz_answers(
 ) -> dict:
     """
     AI-powered assessment of quiz answers.
-    Analyzes why the student chose each answer and provides personalized feedback.
+    Analyzes why the student chose each wrong answer and provides personalized feedback.
     """
     
-    record = storage.get_curriculum(curriculum_id)
+    record = await asyncio.to_thread(storage.get_curriculum, curriculum_id)
     if not record:
         raise ValueError("Curriculum not found")
     
     curriculum = record["curriculum"]
     topic = curriculum["clusters"][cluster_index]["topics"][topic_index]
     
-    # Build question analysis
-    questions_analysis = []
-    for i, (question, answer) in enumerate(zip(quiz.questions, answers)):
-        questions_analysis.append({
+    correct_count, score = score_answers(quiz, answers)
+    
+    # Only wrong answers need the model's analysis; correct ones get the quiz's own explanation
+    incorrect_analysis = [
+        {
             "question_num": i + 1,
             "question": question.question,
-            "options": question.options,
-            "student_answer": question.options[answer] if 0 <= answer < len(question.options) else "No answer",
-            "student_answer_index": answer,
-            "correct_answer": question.options[question.correct_index],
-            "correct_index": question.correct_index,
-            "is_correct": answer == question.correct_index
-        })
-    
-    correct_count = sum(1 for q in questions_analysis if q["is_correct"])
-    score = int((correct_count / len(quiz.questions)) * 100)
+            "student_answer": answer_text(question, answer),
+            "correct_answer": question.options[question.correct_index]
+        }
+        for i, (question, answer) in enumerate(zip(quiz.questions, answers))
+        if answer != question.correct_index
+    ]
     
-    logger.info(f"🔍 Generating AI assessment for quiz (score: {score}%)")
+    logger.info("🔍 Generating AI assessment for quiz (score: %d%%)", score)
     
     prompt = f"""You are an expert educational assessor. Analyze this student's quiz performance and provide detailed, helpful feedback.
 
@@ -256,10 +499,10 @@ Topic: {topic['name']}
 Subject: {curriculum['subject']}
 Score: {score}% ({correct_count}/{len(quiz.questions)} correct)
 
-Quiz Results:
-{json.dumps(questions_analysis, indent=2)}
+Incorrect answers (every other question was answered correctly):
+{orjson.dumps(incorrect_analysis).decode()}
 
-For each INCORRECT answer, provide:
+For each incorrect answer, provide:
 1. An analysis of why the student likely chose that answer (common misconceptions)
 2. A clear explanation of why it's wrong
 3. Why the correct answer is right
@@ -274,10 +517,7 @@ Respond with JSON:
     "question_feedback": [
         {{
             "question_num": 1,
-            "is_correct": true/false,
-            "student_choice": "Their answer",
-            "correct_answer": "The right answer",
-            "analysis": "For incorrect: Why they likely chose this / For correct: Good understanding shown",
+            "analysis": "Why they likely chose this answer",
             "explanation": "Detailed explanation of the concept"
         }}
     ],
@@ -291,18 +531,31 @@ Respond with JSON:
 
 Respond ONLY with the JSON."""
 
-    response_text = await _call_llm([{"role": "user", "content": prompt}], max_tokens=3000)
+    response_text = await _call_llm([{"role": "user", "content": prompt}], max_tokens=ASSESSMENT_MAX_TOKENS)
     
     assessment = _parse_json_response(response_text)
+    
+    # Merge the model's feedback for wrong answers into a full per-question breakdown
+    ai_feedback = {f.get("question_num"): f for f in assessment.get("question_feedback", [])}
+    question_feedback = []
+    for i, (question, answer) in enumerate(zip(quiz.questions, answers)):
+        is_correct = answer == question.correct_index
+        feedback = {} if is_correct else ai_feedback.get(i + 1, {})
+        question_feedback.append({
+            "question_num": i + 1,
+            "is_correct": is_correct,
+            "student_choice": answer_text(question, answer),
+            "correct_answer": question.options[question.correct_index],
+            "analysis": "Good understanding shown" if is_correct else feedback.get("analysis", ""),
+            "explanation": feedback.get("explanation") or question.explanation
+        })
+    assessment["question_feedback"] = question_feedback
     assessment["score"] = score
     assessment["correct_count"] = correct_count
     assessment["total_questions"] = len(quiz.questions)
     assessment["passed"] = score >= quiz.passing_score
     assessment["quiz_version"] = quiz_version
     
-    # Cache the assessment
-    content_cache.save_assessment(curriculum_id, cluster_index, topic_index, quiz_version, assessment)
-    
-    logger.info(f"✅ Assessment complete for quiz v{quiz_version}")
+    logger.info("✅ Assessment complete for quiz v%d", quiz_version)
     
     return assessment
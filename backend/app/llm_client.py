@@ -0,0 +1,24 @@
+"""Shared Anthropic client so every module reuses the same connection pool."""
+import os
+import httpx
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Fail fast when the API can't be reached, but leave room for long lesson completions
+LLM_TIMEOUT = httpx.Timeout(600.0, connect=5.0)
+
+# Keep every pooled connection alive between calls so batch preparation never re-handshakes
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_LIMITS = httpx.Limits(
+    max_connections=LLM_MAX_CONNECTIONS,
+    max_keepalive_connections=LLM_MAX_CONNECTIONS
+)
+
+# HTTP/2 lets concurrent requests multiplex over one connection to the API
+async_client = AsyncAnthropic(
+    http_client=DefaultAsyncHttpxClient(http2=True, limits=LLM_LIMITS),
+    max_retries=2,
+    timeout=LLM_TIMEOUT
+)
@@ -1,21 +1,32 @@
-import json
+import anthropic
+import orjson
 import logging
 import asyncio
+import hashlib
 import os
-from fastapi import FastAPI, HTTPException
+import re
+import time
+import uuid
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from sse_starlette.sse import EventSourceResponse
 from dotenv import load_dotenv
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
 from .models import (
-    ParseRequest, Curriculum, LessonRequest, QuizRequest, 
-    QuizSubmission
+    ParseRequest, LessonRequest, QuizRequest, 
+    QuizSubmission, TopicRequest
 )
 from .curriculum_parser import parse_curriculum_with_progress
 from . import storage
 from . import learning
 from . import content_cache
+from . import llm_client
 
 # Load environment variables
 load_dotenv()
@@ -47,13 +58,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Thread pool for CPU-bound parsing work
-_executor = ThreadPoolExecutor(max_workers=2)
-
 app = FastAPI(
     title="Study Buddy API",
     description="API for parsing learning topics into structured curricula",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -66,6 +75,60 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+# Compress JSON responses; smaller bodies are not worth the CPU
+GZIP_MINIMUM_SIZE = 1024
+
+
+class EventStreamAwareGZipMiddleware:
+    """
+    GZipMiddleware that never compresses text/event-stream responses.
+    Each response is routed when its start message arrives: SSE goes straight to the client's send
+    (compressing would buffer frames inside zlib), everything else through a stock GZipMiddleware.
+    """
+    
+    def __init__(self, app, minimum_size: int = 500, compresslevel: int = 9):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        passthrough = False
+        
+        async def app_routing_event_streams(scope, receive, gzip_send):
+            async def route(message):
+                nonlocal passthrough
+                if message["type"] == "http.response.start":
+                    content_type = Headers(raw=message["headers"]).get("content-type", "")
+                    passthrough = content_type.startswith("text/event-stream")
+                await (send if passthrough else gzip_send)(message)
+            
+            await self.app(scope, receive, route)
+        
+        gzip = GZipMiddleware(app_routing_event_streams, self.minimum_size, self.compresslevel)
+        await gzip(scope, receive, send)
+
+
+app.add_middleware(EventStreamAwareGZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
+
+
+@app.on_event("startup")
+async def configure_thread_pool():
+    """Size the default executor that asyncio.to_thread uses for cache and storage I/O."""
+    max_workers = int(os.getenv("THREAD_POOL_SIZE", "32"))
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=max_workers))
+
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    """Close the shared LLM connection pool."""
+    await llm_client.async_client.close()
+
+
 @app.get("/")
 async def root():
     return {"message": "Study Buddy API is running"}
@@ -86,57 +149,132 @@ async def get_api_status():
 
 # ============ Curriculum Parsing ============
 
+# Seconds between keep-alive comments on SSE streams
+SSE_PING_SECONDS = 15
+
+def _sse(event: dict) -> dict:
+    """Build one server-sent event for EventSourceResponse."""
+    return {"data": orjson.dumps(event).decode()}
+
+
+def _event_stream(events) -> EventSourceResponse:
+    """Stream SSE events with keep-alive pings so proxies don't drop long-running streams."""
+    return EventSourceResponse(events, ping=SSE_PING_SECONDS, sep="\n", headers={"X-Accel-Buffering": "no"})
+
+
+# Curriculums recently saved from identical input, keyed by input hash: (saved_at, curriculum_id)
+PARSE_DEDUP_TTL_SECONDS = 600
+PARSE_DEDUP_MAX_ENTRIES = 128
+_recent_parses: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+
+async def _recent_parse(text_hash: str) -> Optional[dict]:
+    """Return the curriculum record saved from the same input recently, if it still exists."""
+    entry = _recent_parses.get(text_hash)
+    if entry is None:
+        return None
+    saved_at, curriculum_id = entry
+    record = await asyncio.to_thread(storage.get_curriculum, curriculum_id)
+    if record is None or time.monotonic() - saved_at > PARSE_DEDUP_TTL_SECONDS:
+        del _recent_parses[text_hash]
+        return None
+    return record
+
+
+def _remember_parse(text_hash: str, curriculum_id: str):
+    """Record which curriculum an input produced, evicting the oldest entries."""
+    _recent_parses[text_hash] = (time.monotonic(), curriculum_id)
+    _recent_parses.move_to_end(text_hash)
+    while len(_recent_parses) > PARSE_DEDUP_MAX_ENTRIES:
+        _recent_parses.popitem(last=False)
+
+
 async def generate_progress_events(raw_text: str):
     """Generator for SSE progress events."""
-    logger.info(f"🚀 New curriculum request received ({len(raw_text)} chars)")
+    logger.info("🚀 New curriculum request received (%d chars)", len(raw_text))
+    
+    # A resubmission of the same text (e.g. a retry after a dropped stream) reuses the saved curriculum
+    text_hash = hashlib.sha256(raw_text.encode()).hexdigest()
+    record = await _recent_parse(text_hash)
+    if record:
+        logger.info("♻️ Reusing curriculum %s parsed from identical input", record["id"])
+        yield _sse({
+            "status": "complete",
+            "message": "Curriculum ready!",
+            "progress": 100,
+            "curriculum": record["curriculum"],
+            "saved_id": record["id"]
+        })
+        return
     
-    # Remove all the executor code - just use async for directly
     async for update in parse_curriculum_with_progress(raw_text):
         if update.get("status") == "complete" and update.get("curriculum"):
-            curriculum = Curriculum(**update["curriculum"])
-            saved_id = storage.save_curriculum(curriculum)
+            # The parser already validated this dict against Curriculum
+            saved_id = await asyncio.to_thread(storage.save_curriculum, update["curriculum"])
             update["saved_id"] = saved_id
+            _remember_parse(text_hash, saved_id)
         
-        event_data = json.dumps(update)
-        yield f"data: {event_data}\n\n"
+        yield _sse(update)
     
-    logger.info(f"📡 SSE stream completed")
+    logger.info("📡 SSE stream completed")
+
+
+# Stops at the first non-whitespace character, so large inputs are never copied
+_NON_WHITESPACE = re.compile(r"\S")
 
 
 @app.post("/api/parse/stream")
 async def parse_topics_stream(request: ParseRequest):
     """Parse raw text into a structured curriculum with SSE progress."""
-    if not request.raw_text.strip():
+    if not _NON_WHITESPACE.search(request.raw_text):
         raise HTTPException(status_code=400, detail="Raw text cannot be empty")
     
-    return StreamingResponse(
-        generate_progress_events(request.raw_text),
-        media_type="text/event-stream",
-        headers={"Cache-Control": "no-cache", "Connection": "keep-alive"}
-    )
+    return _event_stream(generate_progress_events(request.raw_text))
 
 
 # ============ Curriculum Storage ============
 
+def _body_etag(body: bytes) -> str:
+    """Weak ETag derived from a serialized response body."""
+    return f'W/"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    """Whether the client's If-None-Match already names this ETag."""
+    header = request.headers.get("if-none-match")
+    return bool(header) and etag in (tag.strip() for tag in header.split(","))
+
+
+def _json_with_etag(request: Request, body: bytes, etag: str) -> Response:
+    """Return a JSON body with its ETag, or an empty 304 if the client has it already."""
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
 @app.get("/api/curriculums")
 async def list_curriculums():
     """List all saved curriculums with summary info."""
-    return {"curriculums": storage.list_curriculums()}
+    return {"curriculums": await asyncio.to_thread(storage.list_curriculums)}
 
 
 @app.get("/api/curriculums/{curriculum_id}")
-async def get_curriculum(curriculum_id: str):
+async def get_curriculum(curriculum_id: str, request: Request):
     """Get a specific curriculum by ID."""
-    record = storage.get_curriculum(curriculum_id)
+    record = await asyncio.to_thread(storage.get_curriculum, curriculum_id)
     if not record:
         raise HTTPException(status_code=404, detail="Curriculum not found")
-    return record
+    # Saved curriculums are never edited, so id and creation time identify the content
+    etag = f'W/"{record["id"]}-{record["created_at"]}"'
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return ORJSONResponse(record, headers={"ETag": etag})
 
 
 @app.delete("/api/curriculums/{curriculum_id}")
 async def delete_curriculum(curriculum_id: str):
     """Delete a curriculum by ID."""
-    success = storage.delete_curriculum(curriculum_id)
+    success = await asyncio.to_thread(storage.delete_curriculum, curriculum_id)
     if not success:
         raise HTTPException(status_code=404, detail="Curriculum not found")
     return {"success": True, "message": "Curriculum deleted"}
@@ -147,197 +285,252 @@ async def delete_curriculum(curriculum_id: str):
 @app.get("/api/curriculums/{curriculum_id}/progress")
 async def get_progress(curriculum_id: str):
     """Get learning progress for a curriculum."""
-    progress = storage.get_learning_progress(curriculum_id)
+    progress = await asyncio.to_thread(storage.get_learning_progress, curriculum_id)
     if not progress:
-        progress = storage.init_learning_progress(curriculum_id)
+        progress = await asyncio.to_thread(storage.init_learning_progress, curriculum_id)
     return progress
 
 
 @app.post("/api/curriculums/{curriculum_id}/progress/start")
 async def start_learning(curriculum_id: str):
     """Start learning a curriculum."""
-    record = storage.get_curriculum(curriculum_id)
+    record = await asyncio.to_thread(storage.get_curriculum, curriculum_id)
     if not record:
         raise HTTPException(status_code=404, detail="Curriculum not found")
     
-    progress = storage.init_learning_progress(curriculum_id)
+    progress = await asyncio.to_thread(storage.init_learning_progress, curriculum_id)
     return progress
 
 
 # ============ Content Preparation ============
 
-@app.get("/api/curriculums/{curriculum_id}/content-status")
-async def get_content_status(curriculum_id: str):
-    """Check what content is already cached for a curriculum."""
-    record = storage.get_curriculum(curriculum_id)
-    if not record:
-        raise HTTPException(status_code=404, detail="Curriculum not found")
-    
-    curriculum = record["curriculum"]
-    
-    # Count all topics and check cache status
+def _topic_keys(curriculum: dict) -> list[tuple[int, int]]:
+    """All (cluster_index, topic_index) pairs in a curriculum."""
+    return [
+        (ci, ti)
+        for ci, cluster in enumerate(curriculum["clusters"])
+        for ti in range(len(cluster["topics"]))
+    ]
+
+
+def _missing_content(curriculum_id: str, curriculum: dict) -> tuple[int, list[dict], list[dict]]:
+    """Scan the cache once and return the topic count plus the topics missing a lesson or a quiz."""
     total_topics = 0
-    lessons_cached = 0
-    quizzes_cached = 0
     missing_lessons = []
     missing_quizzes = []
     
+    status = content_cache.bulk_status(curriculum_id, _topic_keys(curriculum))
+    
     for ci, cluster in enumerate(curriculum["clusters"]):
         for ti, topic in enumerate(cluster["topics"]):
             total_topics += 1
+            has_lesson, quiz_count = status[(ci, ti)]
+            item = {
+                "cluster_index": ci,
+                "topic_index": ti,
+                "topic_name": topic["name"],
+                "cluster_name": cluster["name"]
+            }
             
-            # Check lesson cache
-            if content_cache.get_cached_lesson(curriculum_id, ci, ti):
-                lessons_cached += 1
-            else:
-                missing_lessons.append({
-                    "cluster_index": ci,
-                    "topic_index": ti,
-                    "topic_name": topic["name"],
-                    "cluster_name": cluster["name"]
-                })
-            
-            # Check quiz cache (at least one quiz exists)
-            if content_cache.get_quiz_count(curriculum_id, ci, ti) > 0:
-                quizzes_cached += 1
-            else:
-                missing_quizzes.append({
-                    "cluster_index": ci,
-                    "topic_index": ti,
-                    "topic_name": topic["name"],
-                    "cluster_name": cluster["name"]
-                })
+            if not has_lesson:
+                missing_lessons.append(item)
+            # At least one quiz version counts as cached
+            if quiz_count == 0:
+                missing_quizzes.append(item)
+    
+    return total_topics, missing_lessons, missing_quizzes
+
+
+@app.get("/api/curriculums/{curriculum_id}/content-status")
+async def get_content_status(curriculum_id: str, request: Request):
+    """Check what content is already cached for a curriculum."""
+    record = await asyncio.to_thread(storage.get_curriculum, curriculum_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Curriculum not found")
+    
+    total_topics, missing_lessons, missing_quizzes = _missing_content(curriculum_id, record["curriculum"])
+    lessons_cached = total_topics - len(missing_lessons)
+    quizzes_cached = total_topics - len(missing_quizzes)
     
     ready = (lessons_cached == total_topics and quizzes_cached == total_topics)
     
-    return {
+    body = orjson.dumps({
         "total_topics": total_topics,
         "lessons_cached": lessons_cached,
         "quizzes_cached": quizzes_cached,
         "missing_lessons": missing_lessons,
         "missing_quizzes": missing_quizzes,
         "ready": ready
-    }
-
-
-# Semaphore to limit concurrent LLM calls during batch preparation
-# 4 concurrent allows fast generation while keeping server responsive
-_prepare_semaphore = asyncio.Semaphore(4)
+    })
+    return _json_with_etag(request, body, _body_etag(body))
+
+
+# Admission control to limit concurrent LLM calls during batch preparation
+# 4 concurrent allows fast generation while keeping server responsive;
+# unlike a Semaphore the cap can be changed at runtime
+PREPARE_CONCURRENCY = 4
+_prepare_cond = asyncio.Condition()
+_prepare_active = 0
+_prepare_max = PREPARE_CONCURRENCY
+
+# After a rate limit the cap drops by one; it climbs back one step per success once this long has passed
+PREPARE_GROW_BACK_SECONDS = 30
+_prepare_last_rate_limit = float("-inf")
+
+
+async def _acquire_prepare_slot():
+    """Wait until a preparation slot is free and take it."""
+    global _prepare_active
+    async with _prepare_cond:
+        await _prepare_cond.wait_for(lambda: _prepare_active < _prepare_max)
+        _prepare_active += 1
+
+
+async def _notify_prepare_waiters(count: int):
+    """Wake up to count tasks waiting for a preparation slot."""
+    async with _prepare_cond:
+        _prepare_cond.notify(count)
+
+
+async def _release_prepare_slot():
+    """Give a preparation slot back and wake one waiter."""
+    global _prepare_active
+    _prepare_active -= 1
+    # Shielded so a cancelled task still hands its slot to the next waiter
+    await asyncio.shield(_notify_prepare_waiters(1))
+
+
+async def set_prepare_concurrency(limit: int):
+    """Change how many preparation generations may run at once."""
+    global _prepare_max
+    if limit < 1:
+        raise ValueError("Concurrency limit must be at least 1")
+    async with _prepare_cond:
+        _prepare_max = limit
+        _prepare_cond.notify_all()
+
+
+async def _adapt_prepare_concurrency(rate_limited: bool):
+    """Back off by one slot on a rate limit, and recover towards PREPARE_CONCURRENCY after a quiet period."""
+    global _prepare_last_rate_limit
+    if rate_limited:
+        _prepare_last_rate_limit = time.monotonic()
+        if _prepare_max > 1:
+            logger.warning("⏬ Rate limited, lowering prepare concurrency to %d", _prepare_max - 1)
+            await set_prepare_concurrency(_prepare_max - 1)
+    elif (
+        _prepare_max < PREPARE_CONCURRENCY
+        and time.monotonic() - _prepare_last_rate_limit >= PREPARE_GROW_BACK_SECONDS
+    ):
+        await set_prepare_concurrency(_prepare_max + 1)
 
 
 @app.post("/api/curriculums/{curriculum_id}/prepare")
-async def prepare_curriculum_content(curriculum_id: str):
+async def prepare_curriculum_content(curriculum_id: str, request: Request):
     """
     Batch generate all missing lessons and quizzes for a curriculum.
-    Runs up to 4 generations in parallel for speed.
-    Streams progress via SSE.
+    Keeps up to 4 generations in flight, starting the next as each one finishes.
+    Streams progress via SSE. When nothing is missing, the reply is just the complete event
+    {"type": "complete", "generated_count": 0, "message": ...}: plain JSON, or a one-event
+    stream for clients that send Accept: text/event-stream (the iOS app).
     """
-    record = storage.get_curriculum(curriculum_id)
+    record = await asyncio.to_thread(storage.get_curriculum, curriculum_id)
     if not record:
         raise HTTPException(status_code=404, detail="Curriculum not found")
     
+    # Build list of all generation tasks needed, each topic's lesson before its quiz
+    _, missing_lessons, missing_quizzes = _missing_content(curriculum_id, record["curriculum"])
+    tasks = sorted(
+        [{"type": "lesson", **item} for item in missing_lessons]
+        + [{"type": "quiz", **item} for item in missing_quizzes],
+        key=lambda task: (task["cluster_index"], task["topic_index"], task["type"])
+    )
+    
+    if not tasks:
+        done = {'type': 'complete', 'generated_count': 0, 'message': 'All content already prepared'}
+        if "text/event-stream" in request.headers.get("accept", ""):
+            async def already_prepared():
+                yield _sse(done)
+            return _event_stream(already_prepared())
+        return ORJSONResponse(done)
+    
     async def generate_content():
-        curriculum = record["curriculum"]
-        
-        # Build list of all generation tasks needed
-        tasks = []
-        for ci, cluster in enumerate(curriculum["clusters"]):
-            for ti, topic in enumerate(cluster["topics"]):
-                # Check if lesson needs generating
-                if not content_cache.get_cached_lesson(curriculum_id, ci, ti):
-                    tasks.append({
-                        "type": "lesson",
-                        "cluster_index": ci,
-                        "topic_index": ti,
-                        "topic_name": topic["name"]
-                    })
-                
-                # Check if quiz needs generating
-                if content_cache.get_quiz_count(curriculum_id, ci, ti) == 0:
-                    tasks.append({
-                        "type": "quiz",
-                        "cluster_index": ci,
-                        "topic_index": ti,
-                        "topic_name": topic["name"]
-                    })
-        
         total = len(tasks)
         
-        if total == 0:
-            yield f"data: {json.dumps({'type': 'complete', 'generated_count': 0, 'message': 'All content already prepared'})}\n\n"
-            return
-        
-        logger.info(f"📦 Starting batch preparation: {total} items for {curriculum_id}")
+        logger.info("📦 Starting batch preparation: %d items for %s", total, curriculum_id)
         
         # Send initial status
-        yield f"data: {json.dumps({'type': 'start', 'total': total})}\n\n"
+        yield _sse({'type': 'start', 'total': total})
         
         generated_count = 0
         errors = []
         completed = 0
         
-        # Process in batches of 4 for parallel generation
-        BATCH_SIZE = 4
+        queue: asyncio.Queue = asyncio.Queue()
         
         async def run_task(task):
-            """Run a single generation task with semaphore."""
-            async with _prepare_semaphore:
-                if task["type"] == "lesson":
-                    await learning.generate_lesson(
-                        curriculum_id,
-                        task["cluster_index"],
-                        task["topic_index"]
-                    )
+            """Run a single generation task in a preparation slot, reporting to the queue."""
+            await _acquire_prepare_slot()
+            try:
+                queue.put_nowait(("started", task, None))
+                try:
+                    if task["type"] == "lesson":
+                        await learning.generate_lesson(
+                            curriculum_id,
+                            task["cluster_index"],
+                            task["topic_index"]
+                        )
+                    else:
+                        await learning.generate_quiz(
+                            curriculum_id,
+                            task["cluster_index"],
+                            task["topic_index"]
+                        )
+                except Exception as e:
+                    await _adapt_prepare_concurrency(isinstance(e, anthropic.RateLimitError))
+                    queue.put_nowait(("done", task, e))
                 else:
-                    await learning.generate_quiz(
-                        curriculum_id,
-                        task["cluster_index"],
-                        task["topic_index"]
-                    )
-                return task
+                    await _adapt_prepare_concurrency(False)
+                    queue.put_nowait(("done", task, None))
+            finally:
+                await _release_prepare_slot()
         
-        # Process tasks in batches
-        for batch_start in range(0, total, BATCH_SIZE):
-            batch_end = min(batch_start + BATCH_SIZE, total)
-            batch = tasks[batch_start:batch_end]
-            
-            # Send batch start update with cluster/topic indices for frontend tracking
-            yield f"data: {json.dumps({'type': 'batch_start', 'batch_size': len(batch), 'current': batch_start + 1, 'total': total, 'items': [{'type': t['type'], 'topic_name': t['topic_name'], 'cluster_index': t['cluster_index'], 'topic_index': t['topic_index']} for t in batch]})}\n\n"
+        # Submit everything up front; a slot frees up as soon as any task finishes
+        started = 0
+        async with asyncio.TaskGroup() as tg:
+            for task in tasks:
+                tg.create_task(run_task(task))
             
-            # Run batch in parallel
-            batch_results = await asyncio.gather(
-                *[run_task(task) for task in batch],
-                return_exceptions=True
-            )
-            
-            # Process results
-            for i, result in enumerate(batch_results):
-                completed += 1
-                task = batch[i]
+            while completed < total:
+                event, task, error = await queue.get()
+                # Task dicts already hold exactly the fields the frontend tracks
+                items = [task]
                 
-                if isinstance(result, Exception):
-                    logger.error(f"❌ Failed to generate {task['type']} for {task['topic_name']}: {result}")
+                if event == "started":
+                    # Send start update with cluster/topic indices for frontend tracking
+                    started += 1
+                    yield _sse({'type': 'batch_start', 'batch_size': 1, 'current': started, 'total': total, 'items': items})
+                    continue
+                
+                completed += 1
+                if error is not None:
+                    logger.error("❌ Failed to generate %s for %s: %s", task['type'], task['topic_name'], error)
                     errors.append({
                         "type": task["type"],
                         "topic_name": task["topic_name"],
-                        "error": str(result)
+                        "error": str(error)
                     })
                 else:
                     generated_count += 1
-            
-            # Send batch complete update
-            yield f"data: {json.dumps({'type': 'batch_complete', 'completed': completed, 'total': total, 'generated_count': generated_count})}\n\n"
+                
+                yield _sse({'type': 'batch_complete', 'completed': completed, 'total': total, 'generated_count': generated_count, 'items': items})
         
         # Send completion
-        yield f"data: {json.dumps({'type': 'complete', 'generated_count': generated_count, 'errors': errors})}\n\n"
+        yield _sse({'type': 'complete', 'generated_count': generated_count, 'errors': errors})
         
-        logger.info(f"✅ Batch preparation complete: {generated_count}/{total} items generated")
+        logger.info("✅ Batch preparation complete: %d/%d items generated", generated_count, total)
     
-    return StreamingResponse(
-        generate_content(),
-        media_type="text/event-stream",
-        headers={"Cache-Control": "no-cache", "Connection": "keep-alive"}
-    )
+    return _event_stream(generate_content())
 
 
 # ============ Lessons ============
@@ -351,16 +544,64 @@ async def generate_lesson_endpoint(request: LessonRequest):
             request.cluster_index,
             request.topic_index
         )
-        return lesson.model_dump()
+        return Response(content=lesson.model_dump_json(), media_type="application/json")
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        logger.error(f"❌ Lesson generation error: {e}")
+        logger.error("❌ Lesson generation error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to generate lesson")
 
 
+@app.post("/api/lesson/stream")
+async def stream_lesson_endpoint(request: LessonRequest):
+    """Generate a lesson, streaming its plan and each section over SSE as they are written."""
+    if not await asyncio.to_thread(storage.get_curriculum, request.curriculum_id):
+        raise HTTPException(status_code=404, detail="Curriculum not found")
+    
+    async def lesson_events():
+        try:
+            async for event in learning.generate_lesson_events(
+                request.curriculum_id,
+                request.cluster_index,
+                request.topic_index
+            ):
+                yield _sse(event)
+        except Exception as e:
+            logger.error("❌ Lesson generation error: %s", e)
+            yield _sse({'type': 'error', 'message': 'Failed to generate lesson'})
+    
+    return _event_stream(lesson_events())
+
+
+@app.post("/api/topic/start")
+async def start_topic_endpoint(request: TopicRequest):
+    """Generate a topic's lesson and latest quiz in one request (both cached)."""
+    try:
+        lesson, quiz, version = await learning.generate_lesson_and_quiz(
+            request.curriculum_id,
+            request.cluster_index,
+            request.topic_index
+        )
+        return ORJSONResponse({
+            "lesson": lesson.model_dump(),
+            "quiz": _quiz_payload(quiz, version)
+        })
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error("❌ Topic generation error: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to generate topic content")
+
+
 # ============ Quizzes ============
 
+def _quiz_payload(quiz, version: int) -> dict:
+    """Quiz fields plus its version, ready for ORJSONResponse."""
+    payload = quiz.model_dump()
+    payload["version"] = version
+    return payload
+
+
 @app.post("/api/quiz")
 async def generate_quiz_endpoint(request: QuizRequest):
     """Generate a quiz for a specific topic (cached)."""
@@ -370,14 +611,11 @@ async def generate_quiz_endpoint(request: QuizRequest):
             request.cluster_index,
             request.topic_index
         )
-        return {
-            **quiz.model_dump(),
-            "version": version
-        }
+        return ORJSONResponse(_quiz_payload(quiz, version))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        logger.error(f"❌ Quiz generation error: {e}")
+        logger.error("❌ Quiz generation error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to generate quiz")
 
 
@@ -391,14 +629,11 @@ async def generate_new_quiz_endpoint(request: QuizRequest):
             request.topic_index,
             force_new=True
         )
-        return {
-            **quiz.model_dump(),
-            "version": version
-        }
+        return ORJSONResponse(_quiz_payload(quiz, version))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        logger.error(f"❌ Quiz generation error: {e}")
+        logger.error("❌ Quiz generation error: %s", e)
         raise HTTPException(status_code=500, detail="Failed to generate quiz")
 
 
@@ -408,17 +643,14 @@ async def get_quiz_by_version(curriculum_id: str, cluster_index: int, topic_inde
     quiz = content_cache.get_cached_quiz(curriculum_id, cluster_index, topic_index, version)
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
-    return {
-        **quiz.model_dump(),
-        "version": version
-    }
+    return ORJSONResponse(_quiz_payload(quiz, version))
 
 
 @app.post("/api/quiz/submit")
 async def submit_quiz(submission: QuizSubmission):
     """Submit quiz answers and get AI-powered assessment."""
     # Get the quiz (latest version or specific version if provided)
-    quiz = content_cache.get_cached_quiz(
+    quiz, quiz_version = content_cache.get_latest_quiz(
         submission.curriculum_id,
         submission.cluster_index,
         submission.topic_index
@@ -427,12 +659,52 @@ async def submit_quiz(submission: QuizSubmission):
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
-    quiz_version = content_cache.get_quiz_count(
-        submission.curriculum_id,
-        submission.cluster_index,
-        submission.topic_index
-    ) - 1
+    # Deferred AI feedback: answer with the score now, finish the assessment in the background
+    if submission.use_ai_grading and submission.defer_ai_feedback:
+        return await _start_deferred_assessment(submission, quiz, quiz_version)
+    
+    return await _complete_assessment(submission, quiz, quiz_version)
+
+
+# Deferred AI assessments by task id; finished ones are kept briefly so clients can collect them
+_pending_assessments: dict[str, asyncio.Task] = {}
+PENDING_ASSESSMENT_TTL_SECONDS = 600
+
+
+async def _start_deferred_assessment(submission: QuizSubmission, quiz, quiz_version: int) -> dict:
+    """Score the quiz locally, record progress, and start the AI assessment as a background task."""
+    correct_count, score = learning.score_answers(quiz, submission.answers)
+    passed = score >= quiz.passing_score
+    
+    if passed:
+        await asyncio.to_thread(
+            storage.update_topic_progress,
+            submission.curriculum_id,
+            submission.cluster_index,
+            submission.topic_index,
+            completed=True,
+            quiz_score=score
+        )
+    
+    task_id = uuid.uuid4().hex
+    task = asyncio.create_task(_complete_assessment(submission, quiz, quiz_version, update_progress=False))
+    _pending_assessments[task_id] = task
+    task.add_done_callback(
+        lambda t: t.get_loop().call_later(PENDING_ASSESSMENT_TTL_SECONDS, _pending_assessments.pop, task_id, None)
+    )
     
+    return {
+        "score": score,
+        "correct_count": correct_count,
+        "total_questions": len(quiz.questions),
+        "passed": passed,
+        "quiz_version": quiz_version,
+        "assessment_task_id": task_id
+    }
+
+
+async def _complete_assessment(submission: QuizSubmission, quiz, quiz_version: int, update_progress: bool = True) -> dict:
+    """Grade a submission (AI or fallback), update progress, and save the assessment."""
     # Use AI assessment if requested and available, otherwise use fallback
     if submission.use_ai_grading:
         try:
@@ -445,7 +717,7 @@ async def submit_quiz(submission: QuizSubmission):
                 submission.answers
             )
         except Exception as e:
-            logger.error(f"❌ AI assessment failed, using fallback: {e}")
+            logger.error("❌ AI assessment failed, using fallback: %s", e)
             
             # Create fallback assessment without AI
             assessment = _create_fallback_assessment(quiz, quiz_version, submission.answers, str(e))
@@ -453,54 +725,69 @@ async def submit_quiz(submission: QuizSubmission):
         # Skip AI, use fallback directly
         assessment = _create_fallback_assessment(quiz, quiz_version, submission.answers, "AI grading not requested")
     
-    # Update progress if passed
-    if assessment["passed"]:
-        storage.update_topic_progress(
+    # Cache the assessment (the only place it is saved, for AI and fallback alike)
+    writes = [
+        asyncio.to_thread(
+            content_cache.save_assessment,
             submission.curriculum_id,
             submission.cluster_index,
             submission.topic_index,
-            completed=True,
-            quiz_score=assessment["score"]
+            quiz_version,
+            assessment
         )
+    ]
     
-    # Cache the assessment
-    content_cache.save_assessment(
-        submission.curriculum_id,
-        submission.cluster_index,
-        submission.topic_index,
-        quiz_version,
-        assessment
-    )
+    # Update progress if passed; the client reads progress right after submitting, so it is written before responding
+    if update_progress and assessment["passed"]:
+        writes.append(asyncio.to_thread(
+            storage.update_topic_progress,
+            submission.curriculum_id,
+            submission.cluster_index,
+            submission.topic_index,
+            completed=True,
+            quiz_score=assessment["score"]
+        ))
     
+    await asyncio.gather(*writes)
     return assessment
 
 
+
+@app.get("/api/assessments/pending/{task_id}")
+async def get_pending_assessment(task_id: str):
+    """Wait for a deferred AI assessment and return it."""
+    task = _pending_assessments.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Assessment not found")
+    return await asyncio.shield(task)
+
+
+# Error messages that mean the account is out of credits or throttled
+_CREDITS_ERROR = re.compile(r"credit|rate|quota|billing", re.IGNORECASE)
+
+
 def _create_fallback_assessment(quiz, quiz_version: int, answers: list[int], error_message: str) -> dict:
     """Create a basic assessment when AI is unavailable."""
     
     # Calculate score
-    correct_count = 0
-    question_feedback = []
+    correct_count, score = learning.score_answers(quiz, answers)
+    passed = score >= quiz.passing_score
     
+    question_feedback = []
     for i, (question, answer) in enumerate(zip(quiz.questions, answers)):
         is_correct = answer == question.correct_index
-        if is_correct:
-            correct_count += 1
-        
+        correct_answer = question.options[question.correct_index]
         question_feedback.append({
             "question_num": i + 1,
             "is_correct": is_correct,
-            "student_choice": question.options[answer] if 0 <= answer < len(question.options) else "No answer",
-            "correct_answer": question.options[question.correct_index],
-            "analysis": "Great job!" if is_correct else f"The correct answer was: {question.options[question.correct_index]}",
+            "student_choice": learning.answer_text(question, answer),
+            "correct_answer": correct_answer,
+            "analysis": "Great job!" if is_correct else f"The correct answer was: {correct_answer}",
             "explanation": question.explanation
         })
     
-    score = int((correct_count / len(quiz.questions)) * 100)
-    passed = score >= quiz.passing_score
-    
     # Determine error type for user-friendly message
-    is_credits_error = "credit" in error_message.lower() or "rate" in error_message.lower() or "quota" in error_message.lower() or "billing" in error_message.lower()
+    is_credits_error = _CREDITS_ERROR.search(error_message) is not None
     
     if is_credits_error:
         encouragement = "⚠️ AI feedback unavailable (API credits exhausted). But don't worry - your score has been calculated and saved!"
@@ -530,31 +817,57 @@ def _create_fallback_assessment(quiz, quiz_version: int, answers: list[int], err
 
 
 @app.get("/api/assessments/{curriculum_id}/{cluster_index}/{topic_index}")
-async def get_assessments(curriculum_id: str, cluster_index: int, topic_index: int):
+async def get_assessments(curriculum_id: str, cluster_index: int, topic_index: int, request: Request):
     """Get all quiz assessments for a topic."""
-    return {"assessments": content_cache.get_assessments(curriculum_id, cluster_index, topic_index)}
+    assessments = await content_cache.get_assessments_async(curriculum_id, cluster_index, topic_index)
+    body = orjson.dumps({"assessments": assessments})
+    return _json_with_etag(request, body, _body_etag(body))
+
+
+# Serialized quiz histories and their ETags per topic, with the content stamp they were built from
+QUIZ_HISTORY_CACHE_MAX_ENTRIES = 256
+_quiz_history_cache: OrderedDict[tuple[str, int, int], tuple[tuple[int, int, int], bytes, str]] = OrderedDict()
 
 
 @app.get("/api/history/quiz/{curriculum_id}/{cluster_index}/{topic_index}")
-async def get_quiz_history(curriculum_id: str, cluster_index: int, topic_index: int):
+async def get_quiz_history(curriculum_id: str, cluster_index: int, topic_index: int, request: Request):
     """Get quiz history including all versions and assessments for a topic."""
+    key = (curriculum_id, cluster_index, topic_index)
+    stamp = content_cache.get_topic_stamp(curriculum_id, cluster_index, topic_index)
+    cached = _quiz_history_cache.get(key)
+    if cached and cached[0] == stamp:
+        _quiz_history_cache.move_to_end(key)
+        return _json_with_etag(request, cached[1], cached[2])
+    
     quiz_count = content_cache.get_quiz_count(curriculum_id, cluster_index, topic_index)
-    assessments = content_cache.get_assessments(curriculum_id, cluster_index, topic_index)
+    assessments = await content_cache.get_assessments_async(curriculum_id, cluster_index, topic_index)
+    
+    # Group assessments by quiz version in one pass
+    assessments_by_version: dict[int, list[dict]] = {}
+    for assessment in assessments:
+        assessments_by_version.setdefault(assessment.get("quiz_version"), []).append(assessment)
     
     # Build history with quiz versions and their assessments
-    history = []
-    for version in range(quiz_count):
-        quiz = content_cache.get_cached_quiz(curriculum_id, cluster_index, topic_index, version)
-        if quiz:
-            # Find assessments for this quiz version
-            version_assessments = [a for a in assessments if a.get("quiz_version") == version]
-            history.append({
-                "version": version,
-                "quiz": quiz.model_dump(),
-                "assessments": version_assessments
-            })
+    quiz_versions = await asyncio.to_thread(
+        content_cache.get_all_quiz_versions, curriculum_id, cluster_index, topic_index
+    )
+    history = [
+        {
+            "version": version,
+            "quiz": quiz.model_dump(),
+            "assessments": assessments_by_version.get(version, [])
+        }
+        for version, quiz in quiz_versions
+    ]
     
-    return {
+    result = {
         "total_quizzes": quiz_count,
         "history": history
     }
+    body = orjson.dumps(result)
+    etag = _body_etag(body)
+    _quiz_history_cache[key] = (stamp, body, etag)
+    _quiz_history_cache.move_to_end(key)
+    while len(_quiz_history_cache) > QUIZ_HISTORY_CACHE_MAX_ENTRIES:
+        _quiz_history_cache.popitem(last=False)
+    return _json_with_etag(request, body, etag)
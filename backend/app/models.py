@@ -85,6 +85,13 @@ class QuizRequest(BaseModel):
     topic_index: int
 
 
+class TopicRequest(BaseModel):
+    """Request to generate a topic's lesson and quiz together"""
+    curriculum_id: str
+    cluster_index: int
+    topic_index: int
+
+
 class QuizSubmission(BaseModel):
     """User's quiz answers"""
     curriculum_id: str
@@ -92,6 +99,7 @@ class QuizSubmission(BaseModel):
     topic_index: int
     answers: List[int]  # Index of selected answer for each question
     use_ai_grading: bool = False  # Whether to use AI for grading
+    defer_ai_feedback: bool = False  # Return the score immediately and poll for AI feedback
 
 
 class QuizResult(BaseModel):
@@ -1,75 +1,173 @@
-import json
 import logging
-import uuid
+import sqlite3
+import secrets
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 from typing import Optional
+import orjson
+from . import db
 from .models import Curriculum, LearningProgress, TopicProgress
 
 logger = logging.getLogger(__name__)
 
 # Storage file paths
 STORAGE_DIR = Path(__file__).parent.parent / "data"
+DB_FILE = STORAGE_DIR / "study_buddy.db"
+
+# Legacy JSON stores, imported into the database the first time it is created
 STORAGE_FILE = STORAGE_DIR / "curriculums.json"
 PROGRESS_FILE = STORAGE_DIR / "progress.json"
 
+# One shared connection (opened for the current DB_FILE) used under a lock from any thread
+_db_lock = threading.RLock()
+_db: Optional[tuple[str, sqlite3.Connection]] = None
+
 
-def _ensure_storage_exists():
-    """Ensure storage directory and file exist"""
-    STORAGE_DIR.mkdir(exist_ok=True)
-    if not STORAGE_FILE.exists():
-        STORAGE_FILE.write_text("[]")
-    if not PROGRESS_FILE.exists():
-        PROGRESS_FILE.write_text("{}")
+def _connection() -> sqlite3.Connection:
+    """Get the shared database connection, opening and seeding it on first use."""
+    global _db
+    with _db_lock:
+        path = str(DB_FILE)
+        if _db and _db[0] == path:
+            return _db[1]
+        if _db:
+            _db[1].close()
+        
+        STORAGE_DIR.mkdir(parents=True, exist_ok=True)
+        conn = db.connect(DB_FILE)
+        if conn.execute("PRAGMA user_version").fetchone()[0] == 0:
+            try:
+                _import_json_files(conn)
+            except BaseException:
+                conn.close()
+                raise
+            conn.execute("PRAGMA user_version = 1")
+        _db = (path, conn)
+        return conn
 
 
-def _load_all() -> list[dict]:
-    """Load all curriculums from storage"""
-    _ensure_storage_exists()
-    try:
-        return json.loads(STORAGE_FILE.read_text())
-    except (json.JSONDecodeError, FileNotFoundError):
-        return []
+def _now() -> str:
+    """Current local time as an ISO timestamp; tests replace this to freeze the clock."""
+    return datetime.now().isoformat()
 
 
-def _save_all(data: list[dict]):
-    """Save all curriculums to storage"""
-    _ensure_storage_exists()
-    STORAGE_FILE.write_text(json.dumps(data, indent=2))
+@contextmanager
+def _transaction():
+    """Run several statements atomically on the shared connection."""
+    with _db_lock:
+        conn = _connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
 
 
-def _load_progress() -> dict:
-    """Load all progress data"""
-    _ensure_storage_exists()
+def _read_legacy(path: Path, default):
+    """Read a legacy JSON store, treating a missing or corrupted file as empty."""
     try:
-        return json.loads(PROGRESS_FILE.read_text())
-    except (json.JSONDecodeError, FileNotFoundError):
-        return {}
+        return orjson.loads(path.read_bytes())
+    except (orjson.JSONDecodeError, FileNotFoundError):
+        return default
 
 
-def _save_progress(data: dict):
-    """Save all progress data"""
-    _ensure_storage_exists()
-    PROGRESS_FILE.write_text(json.dumps(data, indent=2))
+def _insert_curriculum(conn: sqlite3.Connection, record: dict, conflict: str = "ABORT") -> int:
+    """
+    Insert a curriculum record along with its summary columns (tolerating fields missing from legacy records).
+    Returns the number of rows inserted.
+    """
+    curriculum = record["curriculum"]
+    clusters = curriculum.get("clusters") or []
+    return conn.execute(
+        f"INSERT OR {conflict} INTO curriculums "
+        "(id, created_at, subject, description, cluster_count, topic_count, data) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            record["id"],
+            record.get("created_at") or _now(),
+            curriculum.get("subject") or "",
+            curriculum.get("description") or "",
+            len(clusters),
+            sum(len(c.get("topics") or []) for c in clusters),
+            orjson.dumps(curriculum).decode()
+        )
+    ).rowcount
 
 
-def save_curriculum(curriculum: Curriculum) -> str:
+def _import_json_files(conn: sqlite3.Connection):
+    """Copy curriculums and progress from the legacy JSON files into a new database."""
+    records = _read_legacy(STORAGE_FILE, [])
+    all_progress = _read_legacy(PROGRESS_FILE, {})
+    if not isinstance(records, list):
+        logger.warning("Skipping legacy curriculums file: expected a list of records")
+        records = []
+    if not isinstance(all_progress, dict):
+        logger.warning("Skipping legacy progress file: expected an object keyed by curriculum ID")
+        all_progress = {}
+    if not records and not all_progress:
+        return
+    
+    imported_curriculums = imported_progress = 0
+    
+    # Run by _connection before the connection is shared, so _transaction() cannot be used here
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # The old file is newest first; insert oldest first so listing by rowid keeps that order
+        for record in reversed(records):
+            if not isinstance(record, dict) or not record.get("id") or not isinstance(record.get("curriculum"), dict):
+                logger.warning("Skipping malformed legacy curriculum record")
+                continue
+            imported_curriculums += _insert_curriculum(conn, record, conflict="IGNORE")
+        for curriculum_id, progress in all_progress.items():
+            topics = (progress.get("topics") or {}) if isinstance(progress, dict) else None
+            if not isinstance(topics, dict):
+                logger.warning(f"Skipping malformed legacy progress for {curriculum_id}")
+                continue
+            started_at = progress.get("started_at") or progress.get("last_activity") or _now()
+            imported_progress += conn.execute(
+                "INSERT OR IGNORE INTO learning (curriculum_id, started_at, last_activity) VALUES (?, ?, ?)",
+                (curriculum_id, started_at, progress.get("last_activity") or started_at)
+            ).rowcount
+            for topic_key, topic in topics.items():
+                if not isinstance(topic, dict):
+                    logger.warning(f"Skipping malformed legacy topic progress {curriculum_id}/{topic_key}")
+                    continue
+                conn.execute(
+                    "INSERT OR IGNORE INTO progress VALUES (?, ?, ?, ?, ?)",
+                    (curriculum_id, topic_key, int(topic.get("completed", False)),
+                     topic.get("quiz_score"), topic.get("completed_at"))
+                )
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    logger.info(f"📥 Imported {imported_curriculums} curriculums and progress for {imported_progress} from JSON files")
+
+
+def save_curriculum(curriculum: Curriculum | dict) -> str:
     """
     Save a curriculum and return its ID.
+    
+    Accepts an already-validated curriculum dict (e.g. the parser's output) as-is.
     """
-    curriculum_id = str(uuid.uuid4())[:8]
+    # 64 random bits, URL-safe; the primary key rejects the (unlikely) duplicate rather than overwriting
+    curriculum_id = secrets.token_urlsafe(8)
+    data = curriculum.model_dump() if isinstance(curriculum, Curriculum) else curriculum
     
     record = {
         "id": curriculum_id,
-        "created_at": datetime.now().isoformat(),
-        "curriculum": curriculum.model_dump()
+        "created_at": _now(),
+        "curriculum": data
     }
     
-    all_curriculums = _load_all()
-    all_curriculums.insert(0, record)  # Add to beginning (newest first)
-    _save_all(all_curriculums)
+    with _db_lock:
+        _insert_curriculum(_connection(), record)
     
-    logger.info(f"💾 Saved curriculum '{curriculum.subject}' with ID: {curriculum_id}")
+    logger.info(f"💾 Saved curriculum '{data['subject']}' with ID: {curriculum_id}")
     return curriculum_id
 
 
@@ -77,41 +175,33 @@ def get_curriculum(curriculum_id: str) -> Optional[dict]:
     """
     Get a curriculum by ID.
     """
-    all_curriculums = _load_all()
-    for record in all_curriculums:
-        if record["id"] == curriculum_id:
-            return record
-    return None
+    with _db_lock:
+        row = _connection().execute(
+            "SELECT id, created_at, data FROM curriculums WHERE id = ?", (curriculum_id,)
+        ).fetchone()
+    if row is None:
+        return None
+    return {
+        "id": row["id"],
+        "created_at": row["created_at"],
+        "curriculum": orjson.loads(row["data"])
+    }
 
 
 def list_curriculums() -> list[dict]:
     """
-    List all saved curriculums (summary info only).
+    List all saved curriculums (summary info only), newest first.
     """
-    all_curriculums = _load_all()
-    summaries = []
-    
-    for record in all_curriculums:
-        curriculum = record["curriculum"]
-        total_topics = sum(len(c["topics"]) for c in curriculum["clusters"])
-        
-        # Get progress info
-        progress = get_learning_progress(record["id"])
-        completed_topics = 0
-        if progress:
-            completed_topics = sum(1 for t in progress.get("topics", {}).values() if t.get("completed"))
-        
-        summaries.append({
-            "id": record["id"],
-            "created_at": record["created_at"],
-            "subject": curriculum["subject"],
-            "description": curriculum["description"],
-            "cluster_count": len(curriculum["clusters"]),
-            "topic_count": total_topics,
-            "completed_topics": completed_topics
-        })
-    
-    return summaries
+    with _db_lock:
+        rows = _connection().execute(
+            "SELECT c.id, c.created_at, c.subject, c.description, c.cluster_count, c.topic_count, "
+            "COUNT(p.topic_key) AS completed_topics "
+            "FROM curriculums c "
+            "LEFT JOIN progress p ON p.curriculum_id = c.id AND p.completed = 1 "
+            "GROUP BY c.id "
+            "ORDER BY c.rowid DESC"
+        ).fetchall()
+    return [dict(row) for row in rows]
 
 
 def delete_curriculum(curriculum_id: str) -> bool:
@@ -120,18 +210,14 @@ def delete_curriculum(curriculum_id: str) -> bool:
     """
     from . import content_cache
     
-    all_curriculums = _load_all()
-    original_length = len(all_curriculums)
+    with _transaction() as conn:
+        deleted = conn.execute("DELETE FROM curriculums WHERE id = ?", (curriculum_id,)).rowcount
+        if deleted:
+            # Also delete progress
+            conn.execute("DELETE FROM progress WHERE curriculum_id = ?", (curriculum_id,))
+            conn.execute("DELETE FROM learning WHERE curriculum_id = ?", (curriculum_id,))
     
-    all_curriculums = [c for c in all_curriculums if c["id"] != curriculum_id]
-    
-    if len(all_curriculums) < original_length:
-        _save_all(all_curriculums)
-        # Also delete progress
-        all_progress = _load_progress()
-        if curriculum_id in all_progress:
-            del all_progress[curriculum_id]
-            _save_progress(all_progress)
+    if deleted:
         # Delete cached lessons/quizzes
         content_cache.delete_curriculum_content(curriculum_id)
         logger.info(f"🗑️ Deleted curriculum with ID: {curriculum_id}")
@@ -144,26 +230,44 @@ def delete_curriculum(curriculum_id: str) -> bool:
 
 def get_learning_progress(curriculum_id: str) -> Optional[dict]:
     """Get learning progress for a curriculum."""
-    all_progress = _load_progress()
-    return all_progress.get(curriculum_id)
+    with _db_lock:
+        conn = _connection()
+        learning = conn.execute(
+            "SELECT started_at, last_activity FROM learning WHERE curriculum_id = ?", (curriculum_id,)
+        ).fetchone()
+        if learning is None:
+            return None
+        topics = conn.execute(
+            "SELECT topic_key, completed, quiz_score, completed_at FROM progress WHERE curriculum_id = ?",
+            (curriculum_id,)
+        ).fetchall()
+    
+    return {
+        "curriculum_id": curriculum_id,
+        "topics": {
+            t["topic_key"]: {
+                "completed": bool(t["completed"]),
+                "quiz_score": t["quiz_score"],
+                "completed_at": t["completed_at"]
+            }
+            for t in topics
+        },
+        "started_at": learning["started_at"],
+        "last_activity": learning["last_activity"]
+    }
 
 
 def init_learning_progress(curriculum_id: str) -> dict:
     """Initialize learning progress for a curriculum."""
-    all_progress = _load_progress()
-    
-    if curriculum_id not in all_progress:
-        now = datetime.now().isoformat()
-        all_progress[curriculum_id] = {
-            "curriculum_id": curriculum_id,
-            "topics": {},
-            "started_at": now,
-            "last_activity": now
-        }
-        _save_progress(all_progress)
-        logger.info(f"🎓 Started learning: {curriculum_id}")
-    
-    return all_progress[curriculum_id]
+    now = _now()
+    with _db_lock:
+        created = _connection().execute(
+            "INSERT OR IGNORE INTO learning (curriculum_id, started_at, last_activity) VALUES (?, ?, ?)",
+            (curriculum_id, now, now)
+        ).rowcount
+        if created:
+            logger.info(f"🎓 Started learning: {curriculum_id}")
+        return get_learning_progress(curriculum_id)
 
 
 def update_topic_progress(
@@ -174,25 +278,24 @@ def update_topic_progress(
     quiz_score: Optional[int] = None
 ) -> dict:
     """Update progress for a specific topic."""
-    all_progress = _load_progress()
-    
-    if curriculum_id not in all_progress:
-        init_learning_progress(curriculum_id)
-        all_progress = _load_progress()
-    
     topic_key = f"{cluster_index}-{topic_index}"
-    now = datetime.now().isoformat()
-    
-    all_progress[curriculum_id]["topics"][topic_key] = {
-        "completed": completed,
-        "quiz_score": quiz_score,
-        "completed_at": now if completed else None
-    }
-    all_progress[curriculum_id]["last_activity"] = now
+    now = _now()
     
-    _save_progress(all_progress)
+    with _transaction() as conn:
+        conn.execute(
+            "INSERT INTO learning (curriculum_id, started_at, last_activity) VALUES (?, ?, ?) "
+            "ON CONFLICT(curriculum_id) DO UPDATE SET last_activity = excluded.last_activity",
+            (curriculum_id, now, now)
+        )
+        conn.execute(
+            "INSERT INTO progress (curriculum_id, topic_key, completed, quiz_score, completed_at) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(curriculum_id, topic_key) DO UPDATE SET "
+            "completed = excluded.completed, quiz_score = excluded.quiz_score, completed_at = excluded.completed_at",
+            (curriculum_id, topic_key, int(completed), quiz_score, now if completed else None)
+        )
     
     if completed:
         logger.info(f"✅ Topic completed: {curriculum_id} - {topic_key} (score: {quiz_score}%)")
     
-    return all_progress[curriculum_id]
+    return get_learning_progress(curriculum_id)
@@ -2,22 +2,16 @@
 Shared fixtures for backend tests.
 """
 import pytest
-import tempfile
-import shutil
-from pathlib import Path
-from unittest.mock import MagicMock, AsyncMock, patch
-import sys
-
-# Add the app directory to the path for imports
-sys.path.insert(0, str(Path(__file__).parent.parent))
+from pytest_asyncio import is_async_test
 
+from app import content_cache, storage
 from app.models import (
     Topic, Cluster, Curriculum, Lesson, LessonSection,
-    Quiz, QuizQuestion, LearningProgress, TopicProgress
+    Quiz, QuizQuestion
 )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_topic():
     """Create a sample topic for testing."""
     return Topic(
@@ -28,7 +22,7 @@ def sample_topic():
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_cluster(sample_topic):
     """Create a sample cluster for testing."""
     return Cluster(
@@ -39,7 +33,7 @@ def sample_cluster(sample_topic):
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_curriculum(sample_cluster):
     """Create a sample curriculum for testing."""
     return Curriculum(
@@ -49,7 +43,23 @@ def sample_curriculum(sample_cluster):
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
+def sample_curriculum_data(sample_curriculum):
+    """The sample curriculum dumped to a dict once, ready for storage."""
+    return sample_curriculum.model_dump()
+
+
+@pytest.fixture(scope="session")
+def mock_curriculum_record(sample_curriculum_data):
+    """Create a mock curriculum record, as storage.get_curriculum returns it."""
+    return {
+        "id": "test123",
+        "curriculum": sample_curriculum_data,
+        "created_at": "2024-01-01T00:00:00"
+    }
+
+
+@pytest.fixture(scope="session")
 def sample_lesson():
     """Create a sample lesson for testing."""
     return Lesson(
@@ -67,7 +77,7 @@ def sample_lesson():
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_quiz():
     """Create a sample quiz for testing."""
     return Quiz(
@@ -91,66 +101,47 @@ def sample_quiz():
 
 
 @pytest.fixture
-def temp_storage_dir(monkeypatch):
-    """Create a temporary directory for storage tests."""
-    temp_dir = tempfile.mkdtemp()
-    temp_path = Path(temp_dir)
-    
+def temp_storage_dir(tmp_path, monkeypatch):
+    """Point storage at a per-test temporary directory."""
     # Patch the storage module paths
-    monkeypatch.setattr("app.storage.STORAGE_DIR", temp_path)
-    monkeypatch.setattr("app.storage.STORAGE_FILE", temp_path / "curriculums.json")
-    monkeypatch.setattr("app.storage.PROGRESS_FILE", temp_path / "progress.json")
-    
-    yield temp_path
-    
-    # Cleanup
-    shutil.rmtree(temp_dir, ignore_errors=True)
-
-
-@pytest.fixture
-def temp_cache_dir(monkeypatch):
-    """Create a temporary directory for content cache tests."""
-    temp_dir = tempfile.mkdtemp()
-    temp_path = Path(temp_dir)
-    
-    # Patch the content_cache module path
-    monkeypatch.setattr("app.content_cache.CACHE_DIR", temp_path)
-    
-    yield temp_path
-    
-    # Cleanup
-    shutil.rmtree(temp_dir, ignore_errors=True)
+    monkeypatch.setattr(storage, "STORAGE_DIR", tmp_path)
+    monkeypatch.setattr(storage, "DB_FILE", tmp_path / "study_buddy.db")
+    monkeypatch.setattr(storage, "STORAGE_FILE", tmp_path / "curriculums.json")
+    monkeypatch.setattr(storage, "PROGRESS_FILE", tmp_path / "progress.json")
+    return tmp_path
 
 
 @pytest.fixture
-def mock_anthropic_client():
-    """Create a mock Anthropic client for testing."""
-    mock_client = MagicMock()
-    mock_response = MagicMock()
-    mock_response.content = [MagicMock(text='{"test": "response"}')]
-    mock_client.messages.create.return_value = mock_response
-    return mock_client
+def temp_cache_dir(tmp_path_factory, monkeypatch):
+    """Point the content cache at a fresh numbered temporary directory."""
+    content_dir = tmp_path_factory.mktemp("content")
+    monkeypatch.setattr(content_cache, "CONTENT_DIR", content_dir)
+    return content_dir
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_llm_lesson_response():
-    """Mock LLM response for lesson generation."""
-    return '''{
-        "topic_name": "Binary Search",
-        "introduction": "Binary search is a powerful algorithm...",
-        "sections": [
-            {
-                "title": "Understanding the Problem",
-                "content": "When searching through sorted data...",
-                "key_points": ["Efficiency matters", "Sorted data required"]
-            }
-        ],
-        "summary": "Binary search provides efficient searching.",
-        "estimated_time_minutes": 15
-    }'''
-
-
-@pytest.fixture
+    """Mock LLM responses for lesson generation, keyed by generation step."""
+    return {
+        "plan": '''{
+            "topic_name": "Binary Search",
+            "introduction": "Binary search is a powerful algorithm...",
+            "sections": [
+                {"title": "Understanding the Problem", "outline": "Why linear search is slow"},
+                {"title": "Halving the Search Space", "outline": "How each comparison discards half"}
+            ],
+            "estimated_time_minutes": 15
+        }''',
+        "section": '''{
+            "title": "Understanding the Problem",
+            "content": "When searching through sorted data...",
+            "key_points": ["Efficiency matters", "Sorted data required"]
+        }''',
+        "summary": '{"summary": "Binary search provides efficient searching."}'
+    }
+
+
+@pytest.fixture(scope="session")
 def mock_llm_quiz_response():
     """Mock LLM response for quiz generation."""
     return '''{
@@ -168,3 +159,11 @@ def mock_llm_quiz_response():
 
 # Configure pytest-asyncio
 pytest_plugins = ('pytest_asyncio',)
+
+
+def pytest_collection_modifyitems(items):
+    """Run every async test on one session-wide event loop instead of a fresh loop each."""
+    session_loop = pytest.mark.asyncio(loop_scope="session")
+    for item in items:
+        if is_async_test(item):
+            item.add_marker(session_loop, append=False)
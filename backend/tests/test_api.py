@@ -1,32 +1,55 @@
 """
 Tests for FastAPI API endpoints.
 """
+import asyncio
 import pytest
 import json
+from collections import OrderedDict
 from pathlib import Path
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock, AsyncMock
 from fastapi.testclient import TestClient
 
+from app import content_cache, learning, main, storage
 from app.main import app
 from app.models import Curriculum, Cluster, Topic, Lesson, LessonSection, Quiz, QuizQuestion
 
 
+@pytest.fixture(scope="session")
+def _app_client():
+    """One TestClient (and event loop) shared by the whole session, so app startup runs once."""
+    with TestClient(app) as c:
+        yield c
+
+
 @pytest.fixture
-def client(temp_storage_dir, monkeypatch, tmp_path):
-    """Create a test client with mocked storage."""
-    # Also mock content cache directory
-    content_dir = tmp_path / "content"
-    content_dir.mkdir()
-    monkeypatch.setattr("app.content_cache.CONTENT_DIR", content_dir)
-    
-    return TestClient(app)
+def client(_app_client, temp_storage_dir, temp_cache_dir):
+    """The shared test client, with storage and content cache pointed at per-test directories."""
+    return _app_client
+
+
+@pytest.fixture
+def learning_mocks(monkeypatch):
+    """Replace LLM generation and quiz cache lookups with mocks the test can configure (cache starts empty)."""
+    mocks = SimpleNamespace(
+        generate_lesson=AsyncMock(),
+        generate_quiz=AsyncMock(),
+        assess_quiz_answers=AsyncMock(),
+        get_cached_quiz=MagicMock(return_value=None),
+        get_quiz_count=MagicMock(return_value=0),
+        save_assessment=MagicMock()
+    )
+    for name in ("generate_lesson", "generate_quiz", "assess_quiz_answers"):
+        monkeypatch.setattr(learning, name, getattr(mocks, name))
+    for name in ("get_cached_quiz", "get_quiz_count", "save_assessment"):
+        monkeypatch.setattr(content_cache, name, getattr(mocks, name))
+    return mocks
 
 
 @pytest.fixture
-def saved_curriculum(temp_storage_dir, sample_curriculum):
+def saved_curriculum(temp_storage_dir, sample_curriculum_data):
     """Save a curriculum and return its ID."""
-    from app import storage
-    return storage.save_curriculum(sample_curriculum)
+    return storage.save_curriculum(sample_curriculum_data)
 
 
 class TestRootEndpoints:
@@ -59,6 +82,24 @@ class TestRootEndpoints:
         assert response.json() == {"has_api_key": False}
 
 
+class TestMissingCurriculum:
+    """Tests that curriculum-scoped endpoints return 404 for unknown IDs."""
+    
+    @pytest.mark.parametrize("method, url, body", [
+        ("GET", "/api/curriculums/nonexistent", None),
+        ("DELETE", "/api/curriculums/nonexistent", None),
+        ("POST", "/api/curriculums/nonexistent/progress/start", None),
+        ("GET", "/api/curriculums/nonexistent/content-status", None),
+        ("POST", "/api/lesson", {"curriculum_id": "nonexistent", "cluster_index": 0, "topic_index": 0}),
+        ("POST", "/api/quiz", {"curriculum_id": "nonexistent", "cluster_index": 0, "topic_index": 0}),
+    ])
+    def test_not_found(self, client, method, url, body):
+        """Test that each endpoint reports a missing curriculum as not found."""
+        response = client.request(method, url, json=body)
+        assert response.status_code == 404
+        assert "not found" in response.json()["detail"].lower()
+
+
 class TestCurriculumEndpoints:
     """Tests for curriculum CRUD endpoints."""
     
@@ -86,11 +127,16 @@ class TestCurriculumEndpoints:
         assert data["id"] == saved_curriculum
         assert data["curriculum"]["subject"] == "Data Structures and Algorithms"
     
-    def test_get_curriculum_not_found(self, client):
-        """Test getting a non-existent curriculum."""
-        response = client.get("/api/curriculums/nonexistent")
-        assert response.status_code == 404
-        assert "not found" in response.json()["detail"].lower()
+    def test_get_curriculum_not_modified(self, client, saved_curriculum):
+        """Test that a matching If-None-Match returns 304 without a body."""
+        etag = client.get(f"/api/curriculums/{saved_curriculum}").headers["etag"]
+        
+        response = client.get(
+            f"/api/curriculums/{saved_curriculum}",
+            headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.content == b""
     
     def test_delete_curriculum(self, client, saved_curriculum):
         """Test deleting a curriculum."""
@@ -101,11 +147,6 @@ class TestCurriculumEndpoints:
         # Verify it's deleted
         response = client.get(f"/api/curriculums/{saved_curriculum}")
         assert response.status_code == 404
-    
-    def test_delete_curriculum_not_found(self, client):
-        """Test deleting a non-existent curriculum."""
-        response = client.delete("/api/curriculums/nonexistent")
-        assert response.status_code == 404
 
 
 class TestProgressEndpoints:
@@ -126,11 +167,6 @@ class TestProgressEndpoints:
         data = response.json()
         assert data["curriculum_id"] == saved_curriculum
         assert "started_at" in data
-    
-    def test_start_learning_not_found(self, client):
-        """Test starting to learn a non-existent curriculum."""
-        response = client.post("/api/curriculums/nonexistent/progress/start")
-        assert response.status_code == 404
 
 
 class TestContentStatusEndpoints:
@@ -148,31 +184,27 @@ class TestContentStatusEndpoints:
         assert data["total_topics"] == 1  # One topic in sample curriculum
         assert data["lessons_cached"] == 0  # Nothing cached yet
     
-    def test_get_content_status_not_found(self, client):
-        """Test getting content status for non-existent curriculum."""
-        response = client.get("/api/curriculums/nonexistent/content-status")
-        assert response.status_code == 404
+    def test_get_content_status_revalidates_with_etag(self, client, saved_curriculum, sample_lesson):
+        """Test that an unchanged status returns 304 and a changed one a fresh body."""
+        url = f"/api/curriculums/{saved_curriculum}/content-status"
+        etag = client.get(url).headers["etag"]
+        
+        unchanged = client.get(url, headers={"If-None-Match": etag})
+        assert unchanged.status_code == 304
+        assert unchanged.content == b""
+        
+        content_cache.save_lesson(saved_curriculum, 0, 0, sample_lesson)
+        changed = client.get(url, headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.json()["lessons_cached"] == 1
 
 
 class TestLessonEndpoints:
     """Tests for lesson endpoints."""
     
-    def test_generate_lesson_not_found(self, client):
-        """Test generating a lesson for non-existent curriculum."""
-        response = client.post(
-            "/api/lesson",
-            json={
-                "curriculum_id": "nonexistent",
-                "cluster_index": 0,
-                "topic_index": 0
-            }
-        )
-        assert response.status_code == 404
-    
-    @patch("app.learning.generate_lesson")
-    def test_generate_lesson(self, mock_generate, client, saved_curriculum, sample_lesson):
+    def test_generate_lesson(self, learning_mocks, client, saved_curriculum, sample_lesson):
         """Test generating a lesson."""
-        mock_generate.return_value = sample_lesson
+        learning_mocks.generate_lesson.return_value = sample_lesson
         
         response = client.post(
             "/api/lesson",
@@ -186,14 +218,39 @@ class TestLessonEndpoints:
         data = response.json()
         assert data["topic_name"] == "Binary Search"
 
+    
+    def test_stream_lesson_not_found(self, client):
+        """Test streaming a lesson for a non-existent curriculum."""
+        response = client.post(
+            "/api/lesson/stream",
+            json={"curriculum_id": "nonexistent", "cluster_index": 0, "topic_index": 0}
+        )
+        assert response.status_code == 404
+    
+    def test_stream_lesson(self, client, saved_curriculum, sample_lesson):
+        """Test that lesson events are forwarded as SSE frames."""
+        async def fake_events(*args):
+            yield {"type": "plan", "topic_name": "Binary Search", "introduction": "Intro", "section_titles": ["A"]}
+            yield {"type": "complete", "lesson": sample_lesson.model_dump()}
+        
+        with patch.object(learning, "generate_lesson_events", fake_events):
+            response = client.post(
+                "/api/lesson/stream",
+                json={"curriculum_id": saved_curriculum, "cluster_index": 0, "topic_index": 0}
+            )
+        
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = TestPrepareEndpoint._events(response)
+        assert [e["type"] for e in events] == ["plan", "complete"]
+        assert events[-1]["lesson"]["topic_name"] == sample_lesson.topic_name
 
-class TestQuizEndpoints:
-    """Tests for quiz endpoints."""
+class TestTopicEndpoints:
+    """Tests for the combined lesson + quiz endpoint."""
     
-    def test_generate_quiz_not_found(self, client):
-        """Test generating a quiz for non-existent curriculum."""
+    def test_start_topic_not_found(self, client):
+        """Test starting a topic for non-existent curriculum."""
         response = client.post(
-            "/api/quiz",
+            "/api/topic/start",
             json={
                 "curriculum_id": "nonexistent",
                 "cluster_index": 0,
@@ -202,10 +259,34 @@ class TestQuizEndpoints:
         )
         assert response.status_code == 404
     
-    @patch("app.learning.generate_quiz")
-    def test_generate_quiz(self, mock_generate, client, saved_curriculum, sample_quiz):
+    def test_start_topic(
+        self, learning_mocks, client, saved_curriculum, sample_lesson, sample_quiz
+    ):
+        """Test generating a topic's lesson and quiz in one request."""
+        learning_mocks.generate_lesson.return_value = sample_lesson
+        learning_mocks.generate_quiz.return_value = (sample_quiz, 0)
+        
+        response = client.post(
+            "/api/topic/start",
+            json={
+                "curriculum_id": saved_curriculum,
+                "cluster_index": 0,
+                "topic_index": 0
+            }
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["lesson"]["topic_name"] == "Binary Search"
+        assert data["quiz"]["version"] == 0
+        assert len(data["quiz"]["questions"]) == len(sample_quiz.questions)
+
+
+class TestQuizEndpoints:
+    """Tests for quiz endpoints."""
+    
+    def test_generate_quiz(self, learning_mocks, client, saved_curriculum, sample_quiz):
         """Test generating a quiz."""
-        mock_generate.return_value = (sample_quiz, 0)
+        learning_mocks.generate_quiz.return_value = (sample_quiz, 0)
         
         response = client.post(
             "/api/quiz",
@@ -220,10 +301,9 @@ class TestQuizEndpoints:
         assert data["topic_name"] == "Binary Search"
         assert "version" in data
     
-    @patch("app.learning.generate_quiz")
-    def test_generate_new_quiz(self, mock_generate, client, saved_curriculum, sample_quiz):
+    def test_generate_new_quiz(self, learning_mocks, client, saved_curriculum, sample_quiz):
         """Test force generating a new quiz."""
-        mock_generate.return_value = (sample_quiz, 1)
+        learning_mocks.generate_quiz.return_value = (sample_quiz, 1)
         
         response = client.post(
             "/api/quiz/new",
@@ -244,10 +324,9 @@ class TestQuizEndpoints:
         )
         assert response.status_code == 404
     
-    @patch("app.content_cache.get_cached_quiz")
-    def test_get_quiz_by_version(self, mock_get_quiz, client, saved_curriculum, sample_quiz):
+    def test_get_quiz_by_version(self, learning_mocks, client, saved_curriculum, sample_quiz):
         """Test getting a specific quiz version."""
-        mock_get_quiz.return_value = sample_quiz
+        learning_mocks.get_cached_quiz.return_value = sample_quiz
         
         response = client.get(
             f"/api/quiz/{saved_curriculum}/0/0/0"
@@ -267,13 +346,74 @@ class TestQuizEndpoints:
         assert data["history"] == []
 
 
+    def test_get_quiz_history_refreshes_after_writes(self, client, saved_curriculum, sample_quiz):
+        """Test that a memoized history is rebuilt once new quizzes or assessments are saved."""
+        content_cache.save_quiz(saved_curriculum, 0, 0, sample_quiz)
+        first = client.get(f"/api/history/quiz/{saved_curriculum}/0/0").json()
+        assert first["total_quizzes"] == 1
+        assert first["history"][0]["assessments"] == []
+        
+        content_cache.save_assessment(saved_curriculum, 0, 0, quiz_version=0, assessment={"score": 60, "quiz_version": 0})
+        content_cache.save_quiz(saved_curriculum, 0, 0, sample_quiz)
+        second = client.get(f"/api/history/quiz/{saved_curriculum}/0/0").json()
+        assert second["total_quizzes"] == 2
+        assert second["history"][0]["assessments"][0]["score"] == 60
+    
+    def test_get_quiz_history_empty_after_delete(self, client, saved_curriculum, sample_quiz, monkeypatch):
+        """Test that a history memoized before a restart is not served once the content is deleted."""
+        content_cache.save_quiz(saved_curriculum, 0, 0, sample_quiz)
+        monkeypatch.setattr(content_cache, "_topic_stamps", {})  # as if the process had restarted
+        assert client.get(f"/api/history/quiz/{saved_curriculum}/0/0").json()["total_quizzes"] == 1
+        
+        content_cache.delete_curriculum_content(saved_curriculum)
+        data = client.get(f"/api/history/quiz/{saved_curriculum}/0/0").json()
+        
+        assert data == {"total_quizzes": 0, "history": []}
+    
+    def test_quiz_history_cache_is_bounded(self, client, saved_curriculum, monkeypatch):
+        """Test that the least recently viewed histories are evicted past the size limit."""
+        monkeypatch.setattr(main, "QUIZ_HISTORY_CACHE_MAX_ENTRIES", 2)
+        monkeypatch.setattr(main, "_quiz_history_cache", OrderedDict())
+        for topic_index in range(3):
+            client.get(f"/api/history/quiz/{saved_curriculum}/0/{topic_index}")
+        
+        assert list(main._quiz_history_cache) == [(saved_curriculum, 0, 1), (saved_curriculum, 0, 2)]
+
+    
+    def test_large_json_responses_are_compressed(self, client, saved_curriculum, sample_quiz):
+        """Test that JSON bodies over the size threshold are gzipped."""
+        for _ in range(10):
+            content_cache.save_quiz(saved_curriculum, 0, 0, sample_quiz)
+        response = client.get(
+            f"/api/history/quiz/{saved_curriculum}/0/0",
+            headers={"Accept-Encoding": "gzip"}
+        )
+        
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.json()["total_quizzes"] == 10
+    
+    def test_event_streams_are_not_compressed(self, client, saved_curriculum):
+        """Test that SSE responses bigger than the gzip threshold still arrive uncompressed."""
+        async def fake_events(*args):
+            yield {"type": "section", "content": "x" * (main.GZIP_MINIMUM_SIZE * 2)}
+        
+        with patch.object(learning, "generate_lesson_events", fake_events):
+            response = client.post(
+                "/api/lesson/stream",
+                json={"curriculum_id": saved_curriculum, "cluster_index": 0, "topic_index": 0},
+                headers={"Accept-Encoding": "gzip"}
+            )
+        
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert "content-encoding" not in response.headers
+        assert TestPrepareEndpoint._events(response)[0]["type"] == "section"
+
 class TestQuizSubmission:
     """Tests for quiz submission endpoints."""
     
-    @patch("app.content_cache.get_cached_quiz")
-    def test_submit_quiz_not_found(self, mock_get_quiz, client, saved_curriculum):
+    def test_submit_quiz_not_found(self, learning_mocks, client, saved_curriculum):
         """Test submitting to a non-existent quiz."""
-        mock_get_quiz.return_value = None
+        learning_mocks.get_cached_quiz.return_value = None
         
         response = client.post(
             "/api/quiz/submit",
@@ -286,18 +426,11 @@ class TestQuizSubmission:
         )
         assert response.status_code == 404
     
-    @patch("app.content_cache.save_assessment")
-    @patch("app.content_cache.get_quiz_count")
-    @patch("app.content_cache.get_cached_quiz")
-    @patch("app.learning.assess_quiz_answers")
-    def test_submit_quiz_success(
-        self, mock_assess, mock_get_quiz, mock_count, mock_save,
-        client, saved_curriculum, sample_quiz
-    ):
+    def test_submit_quiz_success(self, learning_mocks, client, saved_curriculum, sample_quiz):
         """Test successful quiz submission."""
-        mock_get_quiz.return_value = sample_quiz
-        mock_count.return_value = 1
-        mock_assess.return_value = {
+        learning_mocks.get_cached_quiz.return_value = sample_quiz
+        learning_mocks.get_quiz_count.return_value = 1
+        learning_mocks.assess_quiz_answers.return_value = {
             "score": 100,
             "passed": True,
             "correct_count": 2,
@@ -322,18 +455,79 @@ class TestQuizSubmission:
         assert data["score"] == 100
         assert data["passed"] is True
         # Verify AI grading was attempted
-        mock_assess.assert_called_once()
+        learning_mocks.assess_quiz_answers.assert_called_once()
+        learning_mocks.save_assessment.assert_called_once()
+    
+    def test_submit_quiz_deferred_ai_feedback(
+        self, learning_mocks, client, saved_curriculum, sample_quiz
+    ):
+        """Test that deferred submissions return the score first and the AI assessment later."""
+        learning_mocks.get_cached_quiz.return_value = sample_quiz
+        learning_mocks.get_quiz_count.return_value = 1
+        learning_mocks.assess_quiz_answers.return_value = {
+            "score": 100,
+            "passed": True,
+            "quiz_version": 0,
+            "question_feedback": [],
+            "summary": {"encouragement": "Great job!"}
+        }
+        
+        response = client.post(
+            "/api/quiz/submit",
+            json={
+                "curriculum_id": saved_curriculum,
+                "cluster_index": 0,
+                "topic_index": 0,
+                "answers": [1, 1],
+                "use_ai_grading": True,
+                "defer_ai_feedback": True
+            }
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["score"] == 100
+        assert data["passed"] is True
+        assert "question_feedback" not in data
+        
+        pending = client.get(f"/api/assessments/pending/{data['assessment_task_id']}")
+        assert pending.status_code == 200
+        assert pending.json()["summary"]["encouragement"] == "Great job!"
+        
+        learning_mocks.save_assessment.assert_called_once()
+    
+    @pytest.mark.parametrize("message, credits", [
+        ("Your credit balance is too low", True),
+        ("RATE_LIMIT exceeded", True),
+        ("Connection reset by peer", False),
+    ])
+    def test_fallback_assessment_explains_credit_errors(self, sample_quiz, message, credits):
+        """Test that credit and rate-limit failures get their own fallback message."""
+        assessment = main._create_fallback_assessment(sample_quiz, 0, [1, 0], message)
+        
+        assert assessment["correct_count"] == 1
+        assert assessment["score"] == 50
+        assert ("credits exhausted" in assessment["summary"]["encouragement"]) is credits
+    
+    def test_fallback_assessment_names_answers_like_ai_feedback(self, sample_quiz):
+        """Test that the fallback describes chosen and out-of-range answers the same way AI assessment does."""
+        assessment = main._create_fallback_assessment(sample_quiz, 0, [1, 9], "Connection reset by peer")
+        
+        assert [f["student_choice"] for f in assessment["question_feedback"]] == [
+            learning.answer_text(q, a) for q, a in zip(sample_quiz.questions, [1, 9])
+        ]
+        assert assessment["question_feedback"][1]["student_choice"] == "No answer"
+    
+    def test_pending_assessment_not_found(self, client):
+        """Test polling an unknown deferred assessment."""
+        response = client.get("/api/assessments/pending/missing")
+        assert response.status_code == 404
     
-    @patch("app.content_cache.save_assessment")
-    @patch("app.content_cache.get_quiz_count")
-    @patch("app.content_cache.get_cached_quiz")
     def test_submit_quiz_without_ai_grading(
-        self, mock_get_quiz, mock_count, mock_save,
-        client, saved_curriculum, sample_quiz
+        self, learning_mocks, client, saved_curriculum, sample_quiz
     ):
         """Test quiz submission without AI grading (uses fallback directly)."""
-        mock_get_quiz.return_value = sample_quiz
-        mock_count.return_value = 1
+        learning_mocks.get_cached_quiz.return_value = sample_quiz
+        learning_mocks.get_quiz_count.return_value = 1
         
         response = client.post(
             "/api/quiz/submit",
@@ -351,18 +545,13 @@ class TestQuizSubmission:
         assert data["passed"] is True
         assert data["fallback_mode"] is True
     
-    @patch("app.content_cache.save_assessment")
-    @patch("app.content_cache.get_quiz_count")
-    @patch("app.content_cache.get_cached_quiz")
-    @patch("app.learning.assess_quiz_answers")
     def test_submit_quiz_with_ai_grading_fallback_on_error(
-        self, mock_assess, mock_get_quiz, mock_count, mock_save,
-        client, saved_curriculum, sample_quiz
+        self, learning_mocks, client, saved_curriculum, sample_quiz
     ):
         """Test quiz submission with AI grading that falls back on error."""
-        mock_get_quiz.return_value = sample_quiz
-        mock_count.return_value = 1
-        mock_assess.side_effect = Exception("API error")
+        learning_mocks.get_cached_quiz.return_value = sample_quiz
+        learning_mocks.get_quiz_count.return_value = 1
+        learning_mocks.assess_quiz_answers.side_effect = Exception("API error")
         
         response = client.post(
             "/api/quiz/submit",
@@ -380,7 +569,7 @@ class TestQuizSubmission:
         assert data["passed"] is True
         assert data["fallback_mode"] is True
         # Verify AI grading was attempted before fallback
-        mock_assess.assert_called_once()
+        learning_mocks.assess_quiz_answers.assert_called_once()
 
 
 class TestAssessmentEndpoints:
@@ -394,6 +583,20 @@ class TestAssessmentEndpoints:
         assert response.status_code == 200
         data = response.json()
         assert data["assessments"] == []
+    
+    def test_get_assessments_revalidates_with_etag(self, client, saved_curriculum):
+        """Test that unchanged assessments return 304 and a new one a fresh body."""
+        url = f"/api/assessments/{saved_curriculum}/0/0"
+        etag = client.get(url).headers["etag"]
+        
+        unchanged = client.get(url, headers={"If-None-Match": etag})
+        assert unchanged.status_code == 304
+        assert unchanged.content == b""
+        
+        content_cache.save_assessment(saved_curriculum, 0, 0, 0, {"score": 100})
+        changed = client.get(url, headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert len(changed.json()["assessments"]) == 1
 
 
 class TestParseStreamEndpoint:
@@ -414,3 +617,170 @@ class TestParseStreamEndpoint:
             json={"raw_text": "   "}
         )
         assert response.status_code == 400
+    
+    def test_parse_reuses_curriculum_for_identical_text(self, client, monkeypatch, sample_curriculum_data):
+        """Test that resubmitting the same text replays the saved curriculum without parsing again."""
+        monkeypatch.setattr(main, "_recent_parses", OrderedDict())
+        calls = []
+        
+        async def fake_parse(raw_text):
+            calls.append(raw_text)
+            yield {"status": "complete", "message": "Curriculum ready!", "progress": 100,
+                   "curriculum": sample_curriculum_data}
+        
+        monkeypatch.setattr(main, "parse_curriculum_with_progress", fake_parse)
+        
+        saved_ids = []
+        for _ in range(2):
+            response = client.post("/api/parse/stream", json={"raw_text": "Binary search"})
+            last = json.loads(response.text.strip().split("\n\n")[-1][len("data: "):])
+            assert last["status"] == "complete"
+            assert last["curriculum"]["subject"] == sample_curriculum_data["subject"]
+            saved_ids.append(last["saved_id"])
+        
+        assert len(calls) == 1
+        assert saved_ids[0] == saved_ids[1]
+
+
+class TestPrepareEndpoint:
+    """Tests for the batch content preparation stream."""
+    
+    @staticmethod
+    def _events(response):
+        """Decode the SSE frames of a streamed response."""
+        return [
+            json.loads(line[len("data: "):])
+            for line in response.text.split("\n\n")
+            if line.startswith("data: ")
+        ]
+    
+    def test_prepare_not_found(self, client):
+        """Test preparing a non-existent curriculum."""
+        response = client.post("/api/curriculums/nonexistent/prepare")
+        assert response.status_code == 404
+    
+    def test_prepare_nothing_missing_returns_json(
+        self, client, saved_curriculum, sample_lesson, sample_quiz
+    ):
+        """Test that a fully prepared curriculum gets the complete event as JSON, not a stream."""
+        content_cache.save_lesson(saved_curriculum, 0, 0, sample_lesson)
+        content_cache.save_quiz(saved_curriculum, 0, 0, sample_quiz)
+        
+        response = client.post(f"/api/curriculums/{saved_curriculum}/prepare")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert response.json() == {
+            "type": "complete",
+            "generated_count": 0,
+            "message": "All content already prepared"
+        }
+    
+    def test_prepare_nothing_missing_streams_for_sse_clients(
+        self, client, saved_curriculum, sample_lesson, sample_quiz
+    ):
+        """Test that clients asking for an event stream still get the complete event as SSE."""
+        content_cache.save_lesson(saved_curriculum, 0, 0, sample_lesson)
+        content_cache.save_quiz(saved_curriculum, 0, 0, sample_quiz)
+        
+        response = client.post(
+            f"/api/curriculums/{saved_curriculum}/prepare",
+            headers={"Accept": "text/event-stream"}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert self._events(response) == [{
+            "type": "complete",
+            "generated_count": 0,
+            "message": "All content already prepared"
+        }]
+    
+    def test_prepare_streams_progress(
+        self, learning_mocks, client, saved_curriculum, sample_curriculum
+    ):
+        """Test that preparation streams start, batch and complete events."""
+        total_topics = sum(len(c.topics) for c in sample_curriculum.clusters)
+        
+        response = client.post(f"/api/curriculums/{saved_curriculum}/prepare")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert response.headers["x-accel-buffering"] == "no"
+        assert "content-encoding" not in response.headers
+        
+        events = self._events(response)
+        assert events[0] == {"type": "start", "total": total_topics * 2}
+        assert any(e["type"] == "batch_start" and e["items"] for e in events)
+        assert events[-1]["type"] == "complete"
+        assert events[-1]["generated_count"] == total_topics * 2
+        assert learning_mocks.generate_lesson.await_count == total_topics
+        assert learning_mocks.generate_quiz.await_count == total_topics
+    
+    def test_prepare_reports_each_completion(
+        self, learning_mocks, client, saved_curriculum, sample_curriculum
+    ):
+        """Test that every finished item gets its own completion event, failures included."""
+        learning_mocks.generate_quiz.side_effect = Exception("LLM down")
+        total_topics = sum(len(c.topics) for c in sample_curriculum.clusters)
+        
+        response = client.post(f"/api/curriculums/{saved_curriculum}/prepare")
+        
+        events = self._events(response)
+        completions = [e for e in events if e["type"] == "batch_complete"]
+        assert len(completions) == total_topics * 2
+        assert [e["completed"] for e in completions] == list(range(1, total_topics * 2 + 1))
+        assert all(len(e["items"]) == 1 for e in completions)
+        assert events[-1]["generated_count"] == total_topics
+        assert len(events[-1]["errors"]) == total_topics
+
+
+class TestPrepareAdmission:
+    """Tests for the resizable preparation concurrency cap."""
+    
+    @pytest.fixture(autouse=True)
+    def fresh_admission(self, monkeypatch):
+        """Give each test its own condition and counters."""
+        monkeypatch.setattr(main, "_prepare_cond", asyncio.Condition())
+        monkeypatch.setattr(main, "_prepare_active", 0)
+        monkeypatch.setattr(main, "_prepare_max", 4)
+        monkeypatch.setattr(main, "_prepare_last_rate_limit", float("-inf"))
+    
+    async def test_raising_limit_admits_waiters(self):
+        """Test that a waiter is admitted as soon as the cap is raised."""
+        await main.set_prepare_concurrency(1)
+        await main._acquire_prepare_slot()
+        
+        waiter = asyncio.create_task(main._acquire_prepare_slot())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        
+        await main.set_prepare_concurrency(2)
+        await asyncio.wait_for(waiter, timeout=1)
+        assert main._prepare_active == 2
+    
+    async def test_release_hands_slot_to_waiter(self):
+        """Test that releasing a slot wakes the next waiter."""
+        await main.set_prepare_concurrency(1)
+        await main._acquire_prepare_slot()
+        waiter = asyncio.create_task(main._acquire_prepare_slot())
+        await asyncio.sleep(0)
+        
+        await main._release_prepare_slot()
+        await asyncio.wait_for(waiter, timeout=1)
+        assert main._prepare_active == 1
+    
+    async def test_invalid_limit_rejected(self):
+        """Test that a cap below one is rejected."""
+        with pytest.raises(ValueError):
+            await main.set_prepare_concurrency(0)
+    
+    async def test_rate_limit_lowers_cap_until_quiet(self, monkeypatch):
+        """Test that a rate limit drops the cap by one and successes only restore it after the cool-down."""
+        await main._adapt_prepare_concurrency(True)
+        assert main._prepare_max == 3
+        
+        await main._adapt_prepare_concurrency(False)
+        assert main._prepare_max == 3
+        
+        monkeypatch.setattr(main, "PREPARE_GROW_BACK_SECONDS", 0)
+        await main._adapt_prepare_concurrency(False)
+        await main._adapt_prepare_concurrency(False)
+        assert main._prepare_max == main.PREPARE_CONCURRENCY
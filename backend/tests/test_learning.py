@@ -1,52 +1,62 @@
 """
 Tests for the learning module with mocked LLM calls.
 """
+import asyncio
 import pytest
 import json
-from unittest.mock import patch, MagicMock, AsyncMock
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock
 
-from app import learning
+from app import content_cache, curriculum_parser, learning, llm_client, storage
 from app.models import Lesson, Quiz, QuizQuestion
 
+# Canned Anthropic message responses; plain namespaces since only .content[0].text is read
+_SUCCESS_RESPONSE = SimpleNamespace(content=[SimpleNamespace(text='{"result": "success"}')])
+_TRUE_RESPONSE = SimpleNamespace(content=[SimpleNamespace(text='{"test": true}')])
+_EMPTY_RESPONSE = SimpleNamespace(content=[SimpleNamespace(text="{}")])
+
+
+@pytest.fixture(autouse=True)
+def isolated_content_dir(temp_cache_dir):
+    """Keep shared lessons written during generation out of the real data directory."""
+    return temp_cache_dir
+
+
+@pytest.fixture
+def patched_storage(monkeypatch, mock_curriculum_record):
+    """Serve the mock curriculum record for any curriculum ID."""
+    monkeypatch.setattr(storage, "get_curriculum", lambda curriculum_id: mock_curriculum_record)
+
+
+@pytest.fixture
+def patched_storage_missing(monkeypatch):
+    """Report every curriculum as missing."""
+    monkeypatch.setattr(storage, "get_curriculum", lambda curriculum_id: None)
+
 
 class TestParseJsonResponse:
     """Tests for the _parse_json_response helper function."""
     
-    def test_parse_valid_json(self):
-        """Test parsing valid JSON."""
-        text = '{"key": "value", "number": 42}'
-        result = learning._parse_json_response(text)
-        assert result == {"key": "value", "number": 42}
-    
-    def test_parse_json_in_code_block(self):
-        """Test parsing JSON wrapped in code block."""
-        text = '''```json
-{"topic_name": "Test", "questions": []}
-```'''
-        result = learning._parse_json_response(text)
-        assert result == {"topic_name": "Test", "questions": []}
-    
-    def test_parse_json_in_code_block_no_language(self):
-        """Test parsing JSON in code block without language specifier."""
-        text = '''```
-{"data": "test"}
-```'''
-        result = learning._parse_json_response(text)
-        assert result == {"data": "test"}
+    @pytest.mark.parametrize("text, expected", [
+        pytest.param('{"key": "value", "number": 42}', {"key": "value", "number": 42}, id="plain"),
+        pytest.param('```json\n{"topic_name": "Test", "questions": []}\n```',
+                     {"topic_name": "Test", "questions": []}, id="code-block"),
+        pytest.param('```\n{"data": "test"}\n```', {"data": "test"}, id="code-block-no-language"),
+        pytest.param('Here is the response:\n        ```json\n        {"result": true}\n        ```\n        That\'s all!',
+                     {"result": True}, id="surrounding-text"),
+    ])
+    def test_parse_json(self, text, expected):
+        """Test parsing JSON bare, fenced, and surrounded by prose."""
+        assert learning._parse_json_response(text) == expected
     
-    def test_parse_json_with_surrounding_text(self):
-        """Test parsing JSON when surrounded by text."""
-        text = '''Here is the response:
-        ```json
-        {"result": true}
-        ```
-        That's all!'''
-        result = learning._parse_json_response(text)
-        assert result == {"result": True}
-    
-    def test_parse_invalid_json_raises(self):
-        """Test that invalid JSON raises ValueError."""
-        text = "This is not JSON at all"
+    @pytest.mark.parametrize("text", [
+        pytest.param("This is not JSON at all", id="not-json"),
+        # An unterminated fence must fail cleanly instead of matching
+        pytest.param('```json\n{"key": "value"}\n' + "`" * 2 + " x" * 10000, id="unterminated-code-block"),
+    ])
+    def test_parse_invalid_json_raises(self, text):
+        """Test that unparseable responses raise ValueError."""
         with pytest.raises(ValueError, match="Failed to parse JSON"):
             learning._parse_json_response(text)
 
@@ -54,38 +64,113 @@ class TestParseJsonResponse:
 class TestGenerateLesson:
     """Tests for lesson generation."""
     
-    @pytest.fixture
-    def mock_curriculum_record(self, sample_curriculum):
-        """Create a mock curriculum record."""
-        return {
-            "id": "test123",
-            "curriculum": sample_curriculum.model_dump(),
-            "created_at": "2024-01-01T00:00:00"
-        }
-    
     @pytest.mark.asyncio
-    @patch("app.learning._call_llm")
-    @patch("app.storage.get_curriculum")
-    @patch("app.content_cache.get_cached_lesson")
-    @patch("app.content_cache.save_lesson")
+    @patch.object(learning, "_call_llm")
+    @patch.object(content_cache, "get_cached_lesson")
+    @patch.object(content_cache, "save_lesson")
     async def test_generate_lesson_new(
-        self, mock_save, mock_get_cached, mock_get_curriculum, mock_llm,
-        mock_curriculum_record, mock_llm_lesson_response
+        self, mock_save, mock_get_cached, mock_llm,
+        patched_storage, mock_llm_lesson_response
     ):
         """Test generating a new lesson when not cached."""
         mock_get_cached.return_value = None
-        mock_get_curriculum.return_value = mock_curriculum_record
-        mock_llm.return_value = mock_llm_lesson_response
+        
+        async def fake_llm(messages, **kwargs):
+            prompt = messages[0]["content"]
+            if prompt.startswith("Plan a"):
+                return mock_llm_lesson_response["plan"]
+            if prompt.startswith("Write one section"):
+                return mock_llm_lesson_response["section"]
+            return mock_llm_lesson_response["summary"]
+        
+        mock_llm.side_effect = fake_llm
+        learning._topic_context.cache_clear()
         
         lesson = await learning.generate_lesson("test123", 0, 0)
         
         assert lesson.topic_name == "Binary Search"
-        assert len(lesson.sections) > 0
+        assert len(lesson.sections) == 2
+        assert lesson.summary == "Binary search provides efficient searching."
+        # One planning call, one per section, one for the summary
+        assert mock_llm.call_count == 4
+        # The topic block is built once and reused by every prompt
+        assert learning._topic_context.cache_info().misses == 1
+        mock_save.assert_called_once()
+    
+    @pytest.mark.asyncio
+    @patch.object(learning, "_call_llm")
+    @patch.object(content_cache, "get_cached_lesson")
+    @patch.object(content_cache, "save_lesson")
+    async def test_generate_lesson_reuses_shared_lesson(
+        self, mock_save, mock_get_cached, mock_llm,
+        patched_storage, mock_curriculum_record, sample_lesson
+    ):
+        """Test that a lesson for the same topic in another curriculum is reused without an LLM call."""
+        curriculum = mock_curriculum_record["curriculum"]
+        cluster = curriculum["clusters"][0]
+        key = content_cache.shared_topic_key(
+            curriculum["subject"].upper(), cluster["name"], "  " + cluster["topics"][0]["name"]
+        )
+        content_cache.save_shared_lesson(key, sample_lesson)
+        mock_get_cached.return_value = None
+        
+        lesson = await learning.generate_lesson("other456", 0, 0)
+        
+        assert lesson.topic_name == sample_lesson.topic_name
+        mock_llm.assert_not_called()
+        mock_save.assert_called_once()
+    
+    @pytest.mark.asyncio
+    @patch.object(learning, "_call_llm")
+    @patch.object(content_cache, "get_cached_lesson")
+    @patch.object(content_cache, "save_lesson")
+    async def test_generate_lesson_events(
+        self, mock_save, mock_get_cached, mock_llm,
+        patched_storage, mock_llm_lesson_response
+    ):
+        """Test that the plan and each section are reported before the finished lesson."""
+        mock_get_cached.return_value = None
+        
+        async def fake_llm(messages, **kwargs):
+            prompt = messages[0]["content"]
+            if prompt.startswith("Plan a"):
+                return mock_llm_lesson_response["plan"]
+            if prompt.startswith("Write one section"):
+                return mock_llm_lesson_response["section"]
+            return mock_llm_lesson_response["summary"]
+        
+        mock_llm.side_effect = fake_llm
+        
+        events = [e async for e in learning.generate_lesson_events("test123", 0, 0)]
+        
+        assert [e["type"] for e in events] == ["plan", "section", "section", "complete"]
+        assert len(events[0]["section_titles"]) == 2
+        assert sorted(e["index"] for e in events[1:3]) == [0, 1]
+        assert events[-1]["lesson"]["topic_name"] == "Binary Search"
         mock_save.assert_called_once()
     
     @pytest.mark.asyncio
-    @patch("app.content_cache.get_cached_lesson")
-    async def test_generate_lesson_cached(self, mock_get_cached, sample_lesson):
+    @patch.object(learning, "_call_llm")
+    @patch.object(content_cache, "get_cached_lesson")
+    async def test_generate_lesson_events_cached(
+        self, mock_get_cached, mock_llm,
+        patched_storage, sample_lesson
+    ):
+        """Test that a cached lesson arrives as a single complete event."""
+        mock_get_cached.return_value = sample_lesson
+        
+        events = [e async for e in learning.generate_lesson_events("test123", 0, 0)]
+        
+        assert events == [{"type": "complete", "lesson": sample_lesson.model_dump()}]
+        mock_llm.assert_not_called()
+    
+    @pytest.mark.asyncio
+    @patch.object(learning, "_call_llm")
+    @patch.object(content_cache, "get_cached_lesson")
+    async def test_generate_lesson_cached(
+        self, mock_get_cached, mock_llm,
+        patched_storage, sample_lesson
+    ):
         """Test that cached lesson is returned without LLM call."""
         mock_get_cached.return_value = sample_lesson
         
@@ -93,16 +178,15 @@ class TestGenerateLesson:
         
         assert lesson.topic_name == "Binary Search"
         mock_get_cached.assert_called_once()
+        mock_llm.assert_not_called()
     
     @pytest.mark.asyncio
-    @patch("app.storage.get_curriculum")
-    @patch("app.content_cache.get_cached_lesson")
+    @patch.object(content_cache, "get_cached_lesson")
     async def test_generate_lesson_curriculum_not_found(
-        self, mock_get_cached, mock_get_curriculum
+        self, mock_get_cached, patched_storage_missing
     ):
         """Test error when curriculum not found."""
         mock_get_cached.return_value = None
-        mock_get_curriculum.return_value = None
         
         with pytest.raises(ValueError, match="Curriculum not found"):
             await learning.generate_lesson("nonexistent", 0, 0)
@@ -111,28 +195,17 @@ class TestGenerateLesson:
 class TestGenerateQuiz:
     """Tests for quiz generation."""
     
-    @pytest.fixture
-    def mock_curriculum_record(self, sample_curriculum):
-        """Create a mock curriculum record."""
-        return {
-            "id": "test123",
-            "curriculum": sample_curriculum.model_dump(),
-            "created_at": "2024-01-01T00:00:00"
-        }
-    
     @pytest.mark.asyncio
-    @patch("app.learning._call_llm")
-    @patch("app.storage.get_curriculum")
-    @patch("app.content_cache.get_cached_quiz")
-    @patch("app.content_cache.get_quiz_count")
-    @patch("app.content_cache.save_quiz")
+    @patch.object(learning, "_call_llm")
+    @patch.object(content_cache, "get_cached_quiz")
+    @patch.object(content_cache, "get_quiz_count")
+    @patch.object(content_cache, "save_quiz")
     async def test_generate_quiz_new(
-        self, mock_save, mock_count, mock_get_cached, mock_get_curriculum, mock_llm,
-        mock_curriculum_record, mock_llm_quiz_response
+        self, mock_save, mock_count, mock_get_cached, mock_llm,
+        patched_storage, mock_llm_quiz_response
     ):
         """Test generating a new quiz when not cached."""
         mock_get_cached.return_value = None
-        mock_get_curriculum.return_value = mock_curriculum_record
         mock_count.return_value = 0
         mock_llm.return_value = mock_llm_quiz_response
         mock_save.return_value = 0
@@ -144,10 +217,11 @@ class TestGenerateQuiz:
         mock_save.assert_called_once()
     
     @pytest.mark.asyncio
-    @patch("app.content_cache.get_cached_quiz")
-    @patch("app.content_cache.get_quiz_count")
+    @patch.object(content_cache, "get_cached_quiz")
+    @patch.object(content_cache, "get_quiz_count")
     async def test_generate_quiz_cached(
-        self, mock_count, mock_get_cached, sample_quiz
+        self, mock_count, mock_get_cached,
+        patched_storage, sample_quiz
     ):
         """Test that cached quiz is returned without LLM call."""
         mock_get_cached.return_value = sample_quiz
@@ -159,18 +233,16 @@ class TestGenerateQuiz:
         assert version == 0  # Count - 1
     
     @pytest.mark.asyncio
-    @patch("app.learning._call_llm")
-    @patch("app.storage.get_curriculum")
-    @patch("app.content_cache.get_cached_quiz")
-    @patch("app.content_cache.get_quiz_count")
-    @patch("app.content_cache.save_quiz")
+    @patch.object(learning, "_call_llm")
+    @patch.object(content_cache, "get_cached_quiz")
+    @patch.object(content_cache, "get_quiz_count")
+    @patch.object(content_cache, "save_quiz")
     async def test_generate_quiz_force_new(
-        self, mock_save, mock_count, mock_get_cached, mock_get_curriculum, mock_llm,
-        mock_curriculum_record, mock_llm_quiz_response
+        self, mock_save, mock_count, mock_get_cached, mock_llm,
+        patched_storage, mock_llm_quiz_response
     ):
         """Test force generating a new quiz even when cached."""
         mock_get_cached.return_value = None  # Won't be called with force_new
-        mock_get_curriculum.return_value = mock_curriculum_record
         mock_count.return_value = 1  # Already has one quiz
         mock_llm.return_value = mock_llm_quiz_response
         mock_save.return_value = 1
@@ -179,16 +251,42 @@ class TestGenerateQuiz:
         
         assert quiz.topic_name == "Binary Search"
         assert version == 1
+        mock_get_cached.assert_not_called()
+    
+    @pytest.mark.asyncio
+    @patch.object(learning, "_call_llm")
+    @patch.object(content_cache, "get_cached_quiz")
+    @patch.object(content_cache, "get_quiz_count")
+    @patch.object(content_cache, "save_quiz")
+    async def test_concurrent_generate_quiz_shares_one_call(
+        self, mock_save, mock_count, mock_get_cached, mock_llm,
+        patched_storage, mock_llm_quiz_response
+    ):
+        """Test that concurrent requests for the same uncached quiz make one LLM call."""
+        mock_get_cached.return_value = None
+        mock_count.return_value = 0
+        mock_save.return_value = 0
+        
+        async def slow_llm(*args, **kwargs):
+            await asyncio.sleep(0.1)
+            return mock_llm_quiz_response
+        
+        mock_llm.side_effect = slow_llm
+        
+        results = await asyncio.gather(*(learning.generate_quiz("test123", 0, 0) for _ in range(3)))
+        
+        assert all(version == 0 for _, version in results)
+        mock_llm.assert_called_once()
+        mock_save.assert_called_once()
+        assert learning._inflight == {}
     
     @pytest.mark.asyncio
-    @patch("app.storage.get_curriculum")
-    @patch("app.content_cache.get_cached_quiz")
+    @patch.object(content_cache, "get_cached_quiz")
     async def test_generate_quiz_curriculum_not_found(
-        self, mock_get_cached, mock_get_curriculum
+        self, mock_get_cached, patched_storage_missing
     ):
         """Test error when curriculum not found."""
         mock_get_cached.return_value = None
-        mock_get_curriculum.return_value = None
         
         with pytest.raises(ValueError, match="Curriculum not found"):
             await learning.generate_quiz("nonexistent", 0, 0)
@@ -197,25 +295,14 @@ class TestGenerateQuiz:
 class TestAssessQuizAnswers:
     """Tests for quiz assessment."""
     
-    @pytest.fixture
-    def mock_curriculum_record(self, sample_curriculum):
-        """Create a mock curriculum record."""
-        return {
-            "id": "test123",
-            "curriculum": sample_curriculum.model_dump(),
-            "created_at": "2024-01-01T00:00:00"
-        }
-    
     @pytest.mark.asyncio
-    @patch("app.learning._call_llm")
-    @patch("app.storage.get_curriculum")
-    @patch("app.content_cache.save_assessment")
+    @patch.object(learning, "_call_llm")
+    @patch.object(content_cache, "save_assessment")
     async def test_assess_quiz_answers(
-        self, mock_save_assessment, mock_get_curriculum, mock_llm,
-        mock_curriculum_record, sample_quiz
+        self, mock_save_assessment, mock_llm,
+        patched_storage, sample_quiz
     ):
         """Test assessing quiz answers."""
-        mock_get_curriculum.return_value = mock_curriculum_record
         mock_llm.return_value = json.dumps({
             "question_feedback": [
                 {
@@ -250,15 +337,58 @@ class TestAssessQuizAnswers:
         assert assessment["score"] == 100
         assert assessment["passed"] is True
         assert assessment["correct_count"] == 2
-        mock_save_assessment.assert_called_once()
+        # Saving is left to the submit endpoint so each attempt is written once
+        mock_save_assessment.assert_not_called()
+    
+    @pytest.mark.asyncio
+    @patch.object(learning, "_call_llm")
+    @patch.object(content_cache, "save_assessment")
+    async def test_assess_quiz_out_of_range_answer(
+        self, mock_save_assessment, mock_llm,
+        patched_storage, sample_quiz
+    ):
+        """Test that an out-of-range answer is sent as unanswered and scored wrong."""
+        mock_llm.return_value = json.dumps({"question_feedback": [], "summary": {}})
+        
+        assessment = await learning.assess_quiz_answers(
+            "test123", 0, 0, sample_quiz, 0, [1, 9]
+        )
+        
+        assert assessment["correct_count"] == 1
+        prompt = mock_llm.call_args.args[0][0]["content"]
+        assert '"student_answer":"No answer"' in prompt
+        assert '"options"' not in prompt
+        # Only the wrong answer is sent for analysis
+        assert '"question_num":1' not in prompt
+        # The breakdown still covers every question, falling back to the quiz's explanation
+        feedback = assessment["question_feedback"]
+        assert [f["is_correct"] for f in feedback] == [True, False]
+        assert feedback[1]["student_choice"] == "No answer"
+        assert feedback[1]["explanation"] == sample_quiz.questions[1].explanation
+    
+    @pytest.mark.asyncio
+    @patch.object(learning, "_call_llm")
+    async def test_assess_quiz_reads_curriculum_off_event_loop(
+        self, mock_llm, monkeypatch, mock_curriculum_record, sample_quiz
+    ):
+        """Test that the curriculum is loaded in a worker thread, not on the event loop."""
+        mock_llm.return_value = json.dumps({"question_feedback": [], "summary": {}})
+        threads = []
+        
+        def get_curriculum(curriculum_id):
+            threads.append(threading.current_thread())
+            return mock_curriculum_record
+        
+        monkeypatch.setattr(storage, "get_curriculum", get_curriculum)
+        await learning.assess_quiz_answers("test123", 0, 0, sample_quiz, 0, [1, 9])
+        
+        assert threads and threading.main_thread() not in threads
     
     @pytest.mark.asyncio
-    @patch("app.storage.get_curriculum")
     async def test_assess_quiz_curriculum_not_found(
-        self, mock_get_curriculum, sample_quiz
+        self, patched_storage_missing, sample_quiz
     ):
         """Test error when curriculum not found."""
-        mock_get_curriculum.return_value = None
         
         with pytest.raises(ValueError, match="Curriculum not found"):
             await learning.assess_quiz_answers(
@@ -270,28 +400,57 @@ class TestLLMCalls:
     """Tests for the LLM call wrapper functions."""
     
     @pytest.mark.asyncio
-    @patch("app.learning.client")
+    @patch.object(learning, "client")
     async def test_call_llm_async(self, mock_client):
         """Test the async LLM call wrapper."""
-        mock_response = MagicMock()
-        mock_response.content = [MagicMock(text='{"result": "success"}')]
-        mock_client.messages.create.return_value = mock_response
+        mock_client.messages.create = AsyncMock(return_value=_SUCCESS_RESPONSE)
         
         result = await learning._call_llm([{"role": "user", "content": "test"}])
         
         assert result == '{"result": "success"}'
     
-    @patch("app.learning.client")
-    def test_call_llm_sync(self, mock_client):
-        """Test the sync LLM call function."""
-        mock_response = MagicMock()
-        mock_response.content = [MagicMock(text='{"test": true}')]
-        mock_client.messages.create.return_value = mock_response
-        
-        result = learning._call_llm_sync(
+    @pytest.mark.asyncio
+    @patch.object(learning, "client")
+    async def test_call_llm_passes_system_prompt(self, mock_client):
+        """Test that a system prompt is forwarded to the API."""
+        mock_client.messages.create = AsyncMock(return_value=_TRUE_RESPONSE)
+        
+        result = await learning._call_llm(
             [{"role": "user", "content": "test"}],
             system="You are a helpful assistant"
         )
         
         assert result == '{"test": true}'
-        mock_client.messages.create.assert_called_once()
+        mock_client.messages.create.assert_awaited_once()
+        system = mock_client.messages.create.call_args.kwargs["system"]
+        assert system[0]["text"] == "You are a helpful assistant"
+        assert system[0]["cache_control"] == {"type": "ephemeral"}
+    
+    @pytest.mark.asyncio
+    @patch.object(learning, "client")
+    async def test_call_llm_respects_concurrency_cap(self, mock_client):
+        """Test that in-flight LLM calls are capped by the semaphore."""
+        in_flight = 0
+        peak = 0
+        
+        async def fake_create(**kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return _EMPTY_RESPONSE
+        
+        mock_client.messages.create = fake_create
+        
+        with patch.object(learning, "_llm_semaphore", asyncio.Semaphore(2)):
+            await asyncio.gather(*(
+                learning._call_llm([{"role": "user", "content": "test"}]) for _ in range(6)
+            ))
+        
+        assert peak == 2
+    
+    def test_clients_share_connection_pool(self):
+        """Test that LLM callers reuse the shared client."""
+        assert learning.client is llm_client.async_client
+        assert curriculum_parser.client is llm_client.async_client
@@ -15,38 +15,28 @@ from app.models import (
 class TestTopicModel:
     """Tests for the Topic model."""
     
-    def test_valid_topic(self):
-        """Test creating a valid topic."""
-        topic = Topic(
-            name="Arrays",
-            description="Introduction to arrays",
-            order=1,
-            prerequisites=[]
-        )
-        assert topic.name == "Arrays"
-        assert topic.description == "Introduction to arrays"
-        assert topic.order == 1
-        assert topic.prerequisites == []
-    
-    def test_topic_with_prerequisites(self):
-        """Test topic with prerequisites."""
-        topic = Topic(
-            name="Dynamic Programming",
-            description="Advanced problem-solving technique",
-            order=5,
-            prerequisites=["Recursion", "Arrays"]
-        )
-        assert len(topic.prerequisites) == 2
-        assert "Recursion" in topic.prerequisites
-    
-    def test_topic_default_prerequisites(self):
-        """Test that prerequisites defaults to empty list."""
-        topic = Topic(
-            name="Basics",
-            description="Basic concepts",
-            order=1
-        )
-        assert topic.prerequisites == []
+    @pytest.mark.parametrize("fields, expected_prerequisites", [
+        pytest.param(
+            {"name": "Arrays", "description": "Introduction to arrays", "order": 1, "prerequisites": []},
+            [], id="valid"
+        ),
+        pytest.param(
+            {"name": "Dynamic Programming", "description": "Advanced problem-solving technique", "order": 5,
+             "prerequisites": ["Recursion", "Arrays"]},
+            ["Recursion", "Arrays"], id="with-prerequisites"
+        ),
+        pytest.param(
+            {"name": "Basics", "description": "Basic concepts", "order": 1},
+            [], id="default-prerequisites"
+        ),
+    ])
+    def test_valid_topic(self, fields, expected_prerequisites):
+        """Test creating valid topics, with and without prerequisites."""
+        topic = Topic(**fields)
+        assert topic.name == fields["name"]
+        assert topic.description == fields["description"]
+        assert topic.order == fields["order"]
+        assert topic.prerequisites == expected_prerequisites
     
     def test_topic_missing_required_field(self):
         """Test that missing required fields raise validation error."""
@@ -80,10 +70,11 @@ class TestClusterModel:
     
     def test_cluster_multiple_topics(self):
         """Test cluster with multiple topics."""
+        # Inputs only; the Cluster itself is still validated
         topics = [
-            Topic(name="Topic 1", description="Desc 1", order=1),
-            Topic(name="Topic 2", description="Desc 2", order=2),
-            Topic(name="Topic 3", description="Desc 3", order=3),
+            Topic.model_construct(name="Topic 1", description="Desc 1", order=1),
+            Topic.model_construct(name="Topic 2", description="Desc 2", order=2),
+            Topic.model_construct(name="Topic 3", description="Desc 3", order=3),
         ]
         cluster = Cluster(
             name="Multi-Topic Cluster",
@@ -119,9 +110,10 @@ class TestCurriculumModel:
     
     def test_curriculum_multiple_clusters(self, sample_topic):
         """Test curriculum with multiple clusters."""
+        # Inputs only; the Curriculum itself is still validated
         clusters = [
-            Cluster(name="Cluster 1", description="Desc 1", order=1, topics=[sample_topic]),
-            Cluster(name="Cluster 2", description="Desc 2", order=2, topics=[sample_topic]),
+            Cluster.model_construct(name="Cluster 1", description="Desc 1", order=1, topics=[sample_topic]),
+            Cluster.model_construct(name="Cluster 2", description="Desc 2", order=2, topics=[sample_topic]),
         ]
         curriculum = Curriculum(
             subject="Advanced Topics",
@@ -134,23 +126,18 @@ class TestCurriculumModel:
 class TestLessonModels:
     """Tests for Lesson-related models."""
     
-    def test_lesson_section(self):
-        """Test LessonSection model."""
-        section = LessonSection(
-            title="Introduction",
-            content="This is the content",
-            key_points=["Point 1", "Point 2"]
-        )
-        assert section.title == "Introduction"
-        assert len(section.key_points) == 2
-    
-    def test_lesson_section_empty_key_points(self):
-        """Test LessonSection with default empty key_points."""
-        section = LessonSection(
-            title="Simple Section",
-            content="Content here"
-        )
-        assert section.key_points == []
+    @pytest.mark.parametrize("fields, expected_key_points", [
+        pytest.param(
+            {"title": "Introduction", "content": "This is the content", "key_points": ["Point 1", "Point 2"]},
+            ["Point 1", "Point 2"], id="with-key-points"
+        ),
+        pytest.param({"title": "Simple Section", "content": "Content here"}, [], id="default-key-points"),
+    ])
+    def test_lesson_section(self, fields, expected_key_points):
+        """Test LessonSection model, including the default empty key_points."""
+        section = LessonSection(**fields)
+        assert section.title == fields["title"]
+        assert section.key_points == expected_key_points
     
     def test_valid_lesson(self):
         """Test creating a valid Lesson."""
@@ -193,30 +180,24 @@ class TestQuizModels:
         assert len(question.options) == 4
         assert question.correct_index == 1
     
-    def test_quiz(self):
-        """Test Quiz model."""
-        quiz = Quiz(
-            topic_name="Math Basics",
-            questions=[
-                QuizQuestion(
-                    question="Q1",
-                    options=["A", "B", "C", "D"],
-                    correct_index=0,
-                    explanation="Explanation"
-                )
-            ],
-            passing_score=70
-        )
-        assert quiz.topic_name == "Math Basics"
-        assert quiz.passing_score == 70
-    
-    def test_quiz_default_passing_score(self):
-        """Test Quiz default passing score."""
-        quiz = Quiz(
-            topic_name="Test",
-            questions=[]
-        )
-        assert quiz.passing_score == 80
+    @pytest.mark.parametrize("fields, expected_passing_score", [
+        pytest.param(
+            {
+                "topic_name": "Math Basics",
+                "questions": [
+                    QuizQuestion(question="Q1", options=["A", "B", "C", "D"], correct_index=0, explanation="Explanation")
+                ],
+                "passing_score": 70
+            },
+            70, id="explicit-passing-score"
+        ),
+        pytest.param({"topic_name": "Test", "questions": []}, 80, id="default-passing-score"),
+    ])
+    def test_quiz(self, fields, expected_passing_score):
+        """Test Quiz model, including the default passing score."""
+        quiz = Quiz(**fields)
+        assert quiz.topic_name == fields["topic_name"]
+        assert quiz.passing_score == expected_passing_score
     
     def test_quiz_request(self):
         """Test QuizRequest model."""
@@ -297,8 +278,8 @@ class TestProgressModels:
         progress = LearningProgress(
             curriculum_id="abc123",
             topics={
-                "0-0": TopicProgress(completed=True, quiz_score=90),
-                "0-1": TopicProgress(completed=False)
+                "0-0": TopicProgress.model_construct(completed=True, quiz_score=90),
+                "0-1": TopicProgress.model_construct(completed=False)
             },
             started_at="2024-01-01T00:00:00",
             last_activity="2024-01-15T10:30:00"
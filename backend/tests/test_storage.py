@@ -3,37 +3,81 @@ Tests for storage and content_cache modules.
 """
 import pytest
 import json
+import os
+import shutil
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 from unittest.mock import patch
 
-from app.models import Curriculum, Cluster, Topic, Lesson, LessonSection, Quiz, QuizQuestion
+from app.models import Curriculum, Lesson, LessonSection, Quiz, QuizQuestion
 from app import storage
 from app import content_cache
 
+# A second curriculum for multi-curriculum tests, validated once from plain data
+_ML_CURRICULUM = Curriculum.model_validate({
+    "subject": "Machine Learning",
+    "description": "ML basics",
+    "clusters": [
+        {
+            "name": "Supervised Learning",
+            "description": "Supervised methods",
+            "order": 1,
+            "topics": [
+                {"name": "Linear Regression", "description": "Regression", "order": 1},
+                {"name": "Classification", "description": "Classification", "order": 2}
+            ]
+        }
+    ]
+})
+
+
+@pytest.fixture
+def frozen_now(monkeypatch):
+    """Make storage stamp every write with one fixed timestamp."""
+    now = "2024-01-15T10:30:00"
+    monkeypatch.setattr(storage, "_now", lambda: now)
+    return now
+
 
 class TestStorageModule:
     """Tests for the storage module (curriculums and progress)."""
     
-    def test_ensure_storage_exists(self, temp_storage_dir):
-        """Test that storage directories are created."""
-        storage._ensure_storage_exists()
-        assert temp_storage_dir.exists()
-        assert (temp_storage_dir / "curriculums.json").exists()
-        assert (temp_storage_dir / "progress.json").exists()
+    def test_database_created_on_first_use(self, temp_storage_dir):
+        """Test that the database file is created on first access."""
+        assert storage.list_curriculums() == []
+        assert (temp_storage_dir / "study_buddy.db").exists()
     
     def test_save_curriculum(self, temp_storage_dir, sample_curriculum):
         """Test saving a curriculum."""
         curriculum_id = storage.save_curriculum(sample_curriculum)
         
         assert curriculum_id is not None
-        assert len(curriculum_id) == 8  # UUID first 8 chars
+        assert len(curriculum_id) == 11  # 8 random bytes, base64url
         
         # Verify it was saved
-        all_curriculums = storage._load_all()
+        all_curriculums = storage.list_curriculums()
         assert len(all_curriculums) == 1
         assert all_curriculums[0]["id"] == curriculum_id
-        assert all_curriculums[0]["curriculum"]["subject"] == "Data Structures and Algorithms"
+        assert all_curriculums[0]["subject"] == "Data Structures and Algorithms"
+    
+    def test_save_curriculum_never_overwrites_on_id_collision(self, temp_storage_dir, sample_curriculum):
+        """Test that a duplicate ID fails loudly instead of replacing the existing curriculum."""
+        with patch("app.storage.secrets.token_urlsafe", return_value="sameid12345"):
+            storage.save_curriculum(sample_curriculum)
+            other = sample_curriculum.model_copy(update={"subject": "Other"})
+            with pytest.raises(sqlite3.IntegrityError):
+                storage.save_curriculum(other)
+        
+        assert storage.get_curriculum("sameid12345")["curriculum"]["subject"] == sample_curriculum.subject
+    
+    def test_save_curriculum_dict(self, temp_storage_dir, sample_curriculum_data):
+        """Test that an already-validated curriculum dict is saved as-is."""
+        curriculum_id = storage.save_curriculum(sample_curriculum_data)
+        
+        record = storage.get_curriculum(curriculum_id)
+        assert record["curriculum"] == sample_curriculum_data
     
     def test_get_curriculum(self, temp_storage_dir, sample_curriculum):
         """Test retrieving a curriculum by ID."""
@@ -49,27 +93,22 @@ class TestStorageModule:
         record = storage.get_curriculum("nonexistent")
         assert record is None
     
+    def test_get_curriculum_sees_external_changes(self, temp_storage_dir, sample_curriculum):
+        """Test that rows changed through another connection are picked up."""
+        curriculum_id = storage.save_curriculum(sample_curriculum)
+        storage.get_curriculum(curriculum_id)
+        
+        with sqlite3.connect(storage.DB_FILE) as other:
+            other.execute("DELETE FROM curriculums WHERE id = ?", (curriculum_id,))
+        
+        assert storage.get_curriculum(curriculum_id) is None
+    
     def test_list_curriculums(self, temp_storage_dir, sample_curriculum):
         """Test listing all curriculums."""
         # Save multiple curriculums
         id1 = storage.save_curriculum(sample_curriculum)
         
-        curriculum2 = Curriculum(
-            subject="Machine Learning",
-            description="ML basics",
-            clusters=[
-                Cluster(
-                    name="Supervised Learning",
-                    description="Supervised methods",
-                    order=1,
-                    topics=[
-                        Topic(name="Linear Regression", description="Regression", order=1),
-                        Topic(name="Classification", description="Classification", order=2)
-                    ]
-                )
-            ]
-        )
-        id2 = storage.save_curriculum(curriculum2)
+        id2 = storage.save_curriculum(_ML_CURRICULUM)
         
         summaries = storage.list_curriculums()
         assert len(summaries) == 2
@@ -102,16 +141,18 @@ class TestStorageModule:
         success = storage.delete_curriculum("nonexistent")
         assert success is False
     
-    def test_init_learning_progress(self, temp_storage_dir, sample_curriculum):
+    def test_init_learning_progress(self, temp_storage_dir, sample_curriculum, frozen_now):
         """Test initializing learning progress."""
         curriculum_id = storage.save_curriculum(sample_curriculum)
         
         progress = storage.init_learning_progress(curriculum_id)
         
-        assert progress["curriculum_id"] == curriculum_id
-        assert progress["topics"] == {}
-        assert "started_at" in progress
-        assert "last_activity" in progress
+        assert progress == {
+            "curriculum_id": curriculum_id,
+            "topics": {},
+            "started_at": frozen_now,
+            "last_activity": frozen_now
+        }
     
     def test_get_learning_progress(self, temp_storage_dir, sample_curriculum):
         """Test retrieving learning progress."""
@@ -129,7 +170,7 @@ class TestStorageModule:
         assert progress is not None
         assert progress["curriculum_id"] == curriculum_id
     
-    def test_update_topic_progress(self, temp_storage_dir, sample_curriculum):
+    def test_update_topic_progress(self, temp_storage_dir, sample_curriculum, frozen_now):
         """Test updating topic progress."""
         curriculum_id = storage.save_curriculum(sample_curriculum)
         storage.init_learning_progress(curriculum_id)
@@ -147,7 +188,8 @@ class TestStorageModule:
         assert topic_key in progress["topics"]
         assert progress["topics"][topic_key]["completed"] is True
         assert progress["topics"][topic_key]["quiz_score"] == 85
-        assert progress["topics"][topic_key]["completed_at"] is not None
+        assert progress["topics"][topic_key]["completed_at"] == frozen_now
+        assert progress["last_activity"] == frozen_now
     
     def test_update_topic_progress_creates_if_missing(self, temp_storage_dir, sample_curriculum):
         """Test that update_topic_progress creates progress if it doesn't exist."""
@@ -165,6 +207,19 @@ class TestStorageModule:
         assert progress is not None
         assert "0-0" in progress["topics"]
     
+    def test_concurrent_progress_updates_are_kept(self, temp_storage_dir, sample_curriculum):
+        """Test that progress updates from several threads do not overwrite each other."""
+        curriculum_id = storage.save_curriculum(sample_curriculum)
+        
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(
+                lambda ti: storage.update_topic_progress(curriculum_id, 0, ti, completed=True, quiz_score=80),
+                range(16)
+            ))
+        
+        progress = storage.get_learning_progress(curriculum_id)
+        assert len(progress["topics"]) == 16
+    
     def test_list_curriculums_with_progress(self, temp_storage_dir, sample_curriculum):
         """Test that list_curriculums includes completed topics count."""
         curriculum_id = storage.save_curriculum(sample_curriculum)
@@ -179,15 +234,7 @@ class TestStorageModule:
 class TestContentCacheModule:
     """Tests for the content_cache module."""
     
-    @pytest.fixture
-    def temp_content_dir(self, monkeypatch, tmp_path):
-        """Create a temporary content directory."""
-        content_dir = tmp_path / "content"
-        content_dir.mkdir()
-        monkeypatch.setattr("app.content_cache.CONTENT_DIR", content_dir)
-        return content_dir
-    
-    def test_save_and_get_lesson(self, temp_content_dir, sample_lesson):
+    def test_save_and_get_lesson(self, temp_cache_dir, sample_lesson):
         """Test saving and retrieving a lesson."""
         curriculum_id = "test123"
         
@@ -195,20 +242,59 @@ class TestContentCacheModule:
         content_cache.save_lesson(curriculum_id, 0, 0, sample_lesson)
         
         # Verify file exists
-        lesson_path = temp_content_dir / curriculum_id / "lessons" / "0-0.json"
+        lesson_path = temp_cache_dir / curriculum_id / "lessons" / "0-0.json"
         assert lesson_path.exists()
         
         # Retrieve lesson
         cached_lesson = content_cache.get_cached_lesson(curriculum_id, 0, 0)
         assert cached_lesson is not None
         assert cached_lesson.topic_name == "Binary Search"
+        assert isinstance(cached_lesson.sections[0], LessonSection)
+        assert cached_lesson.model_dump() == sample_lesson.model_dump()
     
-    def test_get_cached_lesson_not_found(self, temp_content_dir):
+    def test_save_and_get_large_lesson(self, temp_cache_dir, sample_lesson):
+        """Test that lessons above the mmap threshold round-trip intact."""
+        curriculum_id = "test123"
+        large_lesson = sample_lesson.model_copy(update={"summary": "x" * 10_000})
+
+        content_cache.save_lesson(curriculum_id, 0, 0, large_lesson)
+
+        cached_lesson = content_cache.get_cached_lesson(curriculum_id, 0, 0)
+        assert cached_lesson is not None
+        assert cached_lesson.summary == large_lesson.summary
+
+    def test_cached_lesson_served_from_memory_until_resaved(self, temp_cache_dir, sample_lesson):
+        """Test that repeated reads reuse the parsed lesson and saves invalidate it."""
+        curriculum_id = "test123"
+        content_cache.save_lesson(curriculum_id, 0, 0, sample_lesson)
+
+        first = content_cache.get_cached_lesson(curriculum_id, 0, 0)
+        assert content_cache.get_cached_lesson(curriculum_id, 0, 0) is first
+
+        updated = sample_lesson.model_copy(update={"summary": "Updated summary"})
+        content_cache.save_lesson(curriculum_id, 0, 0, updated)
+        assert content_cache.get_cached_lesson(curriculum_id, 0, 0).summary == "Updated summary"
+
+    def test_failed_save_keeps_previous_lesson(self, temp_cache_dir, sample_lesson):
+        """Test that a write interrupted midway leaves the old file intact and no temp files behind."""
+        curriculum_id = "test123"
+        content_cache.save_lesson(curriculum_id, 0, 0, sample_lesson)
+        lessons_dir = temp_cache_dir / curriculum_id / "lessons"
+        
+        updated = sample_lesson.model_copy(update={"summary": "Updated summary"})
+        with patch("app.content_cache.os.write", side_effect=OSError("disk full")):
+            with pytest.raises(OSError):
+                content_cache.save_lesson(curriculum_id, 0, 0, updated)
+        
+        assert [p.name for p in lessons_dir.iterdir()] == ["0-0.json"]
+        assert content_cache.get_cached_lesson(curriculum_id, 0, 0).summary == sample_lesson.summary
+    
+    def test_get_cached_lesson_not_found(self, temp_cache_dir):
         """Test getting a non-existent lesson."""
         lesson = content_cache.get_cached_lesson("nonexistent", 0, 0)
         assert lesson is None
     
-    def test_save_and_get_quiz(self, temp_content_dir, sample_quiz):
+    def test_save_and_get_quiz(self, temp_cache_dir, sample_quiz):
         """Test saving and retrieving a quiz."""
         curriculum_id = "test123"
         
@@ -217,7 +303,7 @@ class TestContentCacheModule:
         assert version == 0
         
         # Verify file exists
-        quiz_path = temp_content_dir / curriculum_id / "quizzes" / "0-0" / "quiz_0.json"
+        quiz_path = temp_cache_dir / curriculum_id / "quizzes" / "0-0" / "quiz_0.json"
         assert quiz_path.exists()
         
         # Retrieve quiz
@@ -225,47 +311,134 @@ class TestContentCacheModule:
         assert cached_quiz is not None
         assert cached_quiz.topic_name == "Binary Search"
         assert len(cached_quiz.questions) == 2
+        assert isinstance(cached_quiz.questions[0], QuizQuestion)
+        assert cached_quiz.model_dump() == sample_quiz.model_dump()
     
-    def test_save_multiple_quizzes(self, temp_content_dir, sample_quiz):
-        """Test saving multiple quiz versions."""
+    @pytest.mark.parametrize("n_saves", [0, 1, 2], ids=["none", "one", "two"])
+    def test_quiz_versions(self, temp_cache_dir, sample_quiz, n_saves):
+        """Test that each save gets the next version and every version can be retrieved."""
         curriculum_id = "test123"
         
-        # Save first quiz
-        version1 = content_cache.save_quiz(curriculum_id, 0, 0, sample_quiz)
-        assert version1 == 0
-        
-        # Save second quiz
-        version2 = content_cache.save_quiz(curriculum_id, 0, 0, sample_quiz)
-        assert version2 == 1
+        versions = [content_cache.save_quiz(curriculum_id, 0, 0, sample_quiz) for _ in range(n_saves)]
         
-        # Check count
-        count = content_cache.get_quiz_count(curriculum_id, 0, 0)
-        assert count == 2
+        assert versions == list(range(n_saves))
+        assert content_cache.get_quiz_count(curriculum_id, 0, 0) == n_saves
+        for version in versions:
+            assert content_cache.get_cached_quiz(curriculum_id, 0, 0, version=version) is not None
+        latest = content_cache.get_cached_quiz(curriculum_id, 0, 0, version=-1)
+        assert (latest is not None) == (n_saves > 0)
+    
+    def test_get_latest_quiz_past_ten_versions(self, temp_cache_dir, sample_quiz):
+        """Test that the latest quiz is found by version number, not filename order."""
+        curriculum_id = "test123"
+
+        for _ in range(11):
+            content_cache.save_quiz(curriculum_id, 0, 0, sample_quiz)
+
+        assert content_cache.get_quiz_count(curriculum_id, 0, 0) == 11
+        latest = content_cache.get_cached_quiz(curriculum_id, 0, 0)
+        assert latest is not None
+        assert (temp_cache_dir / curriculum_id / "quizzes" / "0-0" / "quiz_10.json").exists()
+
+    def test_quiz_versions_restart_after_delete(self, temp_cache_dir, sample_quiz):
+        """Test that quiz versions restart from zero once content is deleted."""
+        curriculum_id = "test123"
+
+        content_cache.save_quiz(curriculum_id, 0, 0, sample_quiz)
+        content_cache.save_quiz(curriculum_id, 0, 0, sample_quiz)
+        content_cache.delete_curriculum_content(curriculum_id)
+
+        assert content_cache.get_quiz_count(curriculum_id, 0, 0) == 0
+        assert content_cache.save_quiz(curriculum_id, 0, 0, sample_quiz) == 0
+
+    def test_delete_while_saving_from_threads(self, temp_cache_dir):
+        """Test that deleting one curriculum's content while threads save another's does not fail."""
+        def save(topic_index):
+            content_cache.save_assessment("test123", 0, topic_index, quiz_version=0, assessment={"score": 50})
+        
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            saves = [pool.submit(save, ti) for ti in range(300)]
+            for _ in range(50):
+                content_cache.delete_curriculum_content("other")
+            for future in saves:
+                future.result()
+        
+        assert len(content_cache.get_assessments("test123", 0, 299)) == 1
     
-    def test_get_quiz_by_version(self, temp_content_dir, sample_quiz):
-        """Test retrieving specific quiz version."""
+    def test_topic_stamp_changes_on_writes(self, temp_cache_dir, sample_quiz):
+        """Test that quiz and assessment writes and deletes change the topic stamp."""
         curriculum_id = "test123"
+        stamps = [content_cache.get_topic_stamp(curriculum_id, 0, 0)]
         
         content_cache.save_quiz(curriculum_id, 0, 0, sample_quiz)
+        stamps.append(content_cache.get_topic_stamp(curriculum_id, 0, 0))
+        content_cache.save_assessment(curriculum_id, 0, 0, quiz_version=0, assessment={"score": 50})
+        stamps.append(content_cache.get_topic_stamp(curriculum_id, 0, 0))
+        content_cache.delete_curriculum_content(curriculum_id)
+        stamps.append(content_cache.get_topic_stamp(curriculum_id, 0, 0))
+        
+        assert len(set(stamps)) == 4
+        assert content_cache.get_topic_stamp(curriculum_id, 0, 1) == (0, 0, 0)
+    
+    def test_changes_from_other_processes_are_seen(self, temp_cache_dir, sample_quiz):
+        """Test that quiz counts and topic stamps follow quizzes written or deleted outside this process."""
+        curriculum_id = "test123"
         content_cache.save_quiz(curriculum_id, 0, 0, sample_quiz)
+        assert content_cache.get_quiz_count(curriculum_id, 0, 0) == 1
+        stamp = content_cache.get_topic_stamp(curriculum_id, 0, 0)
+        
+        # Another worker saves version 1; bump the mtime explicitly so coarse timestamps can't hide it
+        quiz_dir = temp_cache_dir / curriculum_id / "quizzes" / "0-0"
+        (quiz_dir / "quiz_1.json").write_text(sample_quiz.model_dump_json())
+        mtime_ns = quiz_dir.stat().st_mtime_ns + 1_000_000
+        os.utime(quiz_dir, ns=(mtime_ns, mtime_ns))
+        
+        assert content_cache.get_quiz_count(curriculum_id, 0, 0) == 2
+        assert content_cache.get_topic_stamp(curriculum_id, 0, 0) != stamp
+        assert content_cache.save_quiz(curriculum_id, 0, 0, sample_quiz) == 2
+        
+        # Another worker deletes the curriculum's content
+        shutil.rmtree(temp_cache_dir / curriculum_id)
+        assert content_cache.get_quiz_count(curriculum_id, 0, 0) == 0
+        assert content_cache.save_quiz(curriculum_id, 0, 0, sample_quiz) == 0
+    
+    def test_bulk_status(self, temp_cache_dir, sample_lesson, sample_quiz):
+        """Test lesson presence and quiz counts for many topics in one call."""
+        curriculum_id = "test123"
+        content_cache.save_lesson(curriculum_id, 0, 0, sample_lesson)
+        content_cache.save_quiz(curriculum_id, 0, 1, sample_quiz)
+        content_cache.save_quiz(curriculum_id, 0, 1, sample_quiz)
         
-        # Get specific version
-        quiz_v0 = content_cache.get_cached_quiz(curriculum_id, 0, 0, version=0)
-        assert quiz_v0 is not None
+        status = content_cache.bulk_status(curriculum_id, [(0, 0), (0, 1), (1, 0)])
         
-        quiz_v1 = content_cache.get_cached_quiz(curriculum_id, 0, 0, version=1)
-        assert quiz_v1 is not None
+        assert status == {(0, 0): (True, 0), (0, 1): (False, 2), (1, 0): (False, 0)}
+        assert content_cache.bulk_status("nonexistent", [(0, 0)]) == {(0, 0): (False, 0)}
+    
+    def test_get_all_quiz_versions(self, temp_cache_dir, sample_quiz):
+        """Test loading every quiz version in version order."""
+        curriculum_id = "test123"
+        for _ in range(12):
+            content_cache.save_quiz(curriculum_id, 0, 0, sample_quiz)
         
-        # Latest version
-        latest = content_cache.get_cached_quiz(curriculum_id, 0, 0, version=-1)
-        assert latest is not None
+        versions = content_cache.get_all_quiz_versions(curriculum_id, 0, 0)
+        
+        assert [v for v, _ in versions] == list(range(12))
+        assert versions[0][1].topic_name == sample_quiz.topic_name
+        assert content_cache.get_all_quiz_versions("nonexistent", 0, 0) == []
     
-    def test_get_quiz_count_empty(self, temp_content_dir):
-        """Test quiz count when none exist."""
-        count = content_cache.get_quiz_count("nonexistent", 0, 0)
-        assert count == 0
+    def test_get_latest_quiz_with_version(self, temp_cache_dir, sample_quiz):
+        """Test that the latest quiz comes back with its version number."""
+        curriculum_id = "test123"
+        assert content_cache.get_latest_quiz(curriculum_id, 0, 0) == (None, -1)
+        
+        content_cache.save_quiz(curriculum_id, 0, 0, sample_quiz)
+        content_cache.save_quiz(curriculum_id, 0, 0, sample_quiz)
+        quiz, version = content_cache.get_latest_quiz(curriculum_id, 0, 0)
+        
+        assert version == 1
+        assert quiz.topic_name == sample_quiz.topic_name
     
-    def test_save_and_get_assessment(self, temp_content_dir):
+    def test_save_and_get_assessment(self, temp_cache_dir):
         """Test saving and retrieving assessments."""
         curriculum_id = "test123"
         assessment = {
@@ -279,21 +452,52 @@ class TestContentCacheModule:
         content_cache.save_assessment(curriculum_id, 0, 0, quiz_version=0, assessment=assessment)
         
         # Verify directory exists
-        assessment_dir = temp_content_dir / curriculum_id / "assessments" / "0-0"
+        assessment_dir = temp_cache_dir / curriculum_id / "assessments" / "0-0"
         assert assessment_dir.exists()
-        assert len(list(assessment_dir.glob("quiz_*.json"))) == 1
+        assert sum(1 for n in os.listdir(assessment_dir) if n.startswith("quiz_") and n.endswith(".json")) == 1
         
         # Get assessments
         assessments = content_cache.get_assessments(curriculum_id, 0, 0)
         assert len(assessments) == 1
         assert assessments[0]["score"] == 80
     
-    def test_get_assessments_empty(self, temp_content_dir):
+    def test_get_assessments_version_from_filename(self, temp_cache_dir):
+        """Test that quiz_version falls back to the filename and newest files come first."""
+        assessment_dir = temp_cache_dir / "test123" / "assessments" / "0-0"
+        assessment_dir.mkdir(parents=True)
+        (assessment_dir / "quiz_0_20241205_120000.json").write_text('{"score": 40}')
+        (assessment_dir / "quiz_1_20241206_120000.json").write_text('{"score": 90}')
+        (assessment_dir / "notes.txt").write_text("ignored")
+
+        assessments = content_cache.get_assessments("test123", 0, 0)
+        assert [a["quiz_version"] for a in assessments] == [1, 0]
+        assert [a["score"] for a in assessments] == [90, 40]
+
+    def test_rapid_assessments_do_not_collide(self, temp_cache_dir):
+        """Test that back-to-back saves get distinct files, listed newest first."""
+        curriculum_id = "test123"
+        for score in (10, 20, 30):
+            content_cache.save_assessment(curriculum_id, 0, 0, quiz_version=0, assessment={"score": score})
+
+        assessments = content_cache.get_assessments(curriculum_id, 0, 0)
+        assert [a["score"] for a in assessments] == [30, 20, 10]
+
+    async def test_get_assessments_async(self, temp_cache_dir):
+        """Test that the async loader matches the sync one."""
+        curriculum_id = "test123"
+        content_cache.save_assessment(curriculum_id, 0, 0, quiz_version=0, assessment={"score": 40})
+        content_cache.save_assessment(curriculum_id, 0, 0, quiz_version=1, assessment={"score": 90})
+
+        assessments = await content_cache.get_assessments_async(curriculum_id, 0, 0)
+        assert assessments == content_cache.get_assessments(curriculum_id, 0, 0)
+        assert [a["score"] for a in assessments] == [90, 40]
+
+    def test_get_assessments_empty(self, temp_cache_dir):
         """Test getting assessments when none exist."""
         assessments = content_cache.get_assessments("nonexistent", 0, 0)
         assert assessments == []
     
-    def test_delete_curriculum_content(self, temp_content_dir, sample_lesson, sample_quiz):
+    def test_delete_curriculum_content(self, temp_cache_dir, sample_lesson, sample_quiz):
         """Test deleting all content for a curriculum."""
         curriculum_id = "test123"
         
@@ -302,7 +506,7 @@ class TestContentCacheModule:
         content_cache.save_quiz(curriculum_id, 0, 0, sample_quiz)
         
         # Verify content exists
-        curriculum_dir = temp_content_dir / curriculum_id
+        curriculum_dir = temp_cache_dir / curriculum_id
         assert curriculum_dir.exists()
         
         # Delete content
@@ -311,35 +515,99 @@ class TestContentCacheModule:
         # Verify deleted
         assert not curriculum_dir.exists()
     
-    def test_delete_curriculum_content_nonexistent(self, temp_content_dir):
+    def test_delete_curriculum_content_nonexistent(self, temp_cache_dir):
         """Test deleting content for non-existent curriculum (should not raise)."""
         # Should not raise any errors
         content_cache.delete_curriculum_content("nonexistent")
 
 
-class TestStorageFileOperations:
-    """Tests for file operation edge cases."""
+class TestStorageLegacyImport:
+    """Tests for importing the old JSON stores into a new database."""
     
-    def test_load_all_empty_file(self, temp_storage_dir):
-        """Test loading from an empty file."""
-        storage._ensure_storage_exists()
-        (temp_storage_dir / "curriculums.json").write_text("[]")
+    def test_import_curriculums_and_progress(self, temp_storage_dir, sample_curriculum_data):
+        """Test that records keep their order and progress when imported."""
+        curriculum = sample_curriculum_data
+        (temp_storage_dir / "curriculums.json").write_text(json.dumps([
+            {"id": "newer", "created_at": "2024-12-06T10:00:00", "curriculum": curriculum},
+            {"id": "older", "created_at": "2024-12-05T10:00:00", "curriculum": curriculum},
+        ]))
+        (temp_storage_dir / "progress.json").write_text(json.dumps({
+            "older": {
+                "curriculum_id": "older",
+                "topics": {"0-0": {"completed": True, "quiz_score": 80, "completed_at": "2024-12-05T11:00:00"}},
+                "started_at": "2024-12-05T10:30:00",
+                "last_activity": "2024-12-05T11:00:00"
+            }
+        }))
+        
+        summaries = storage.list_curriculums()
         
-        curriculums = storage._load_all()
-        assert curriculums == []
+        assert [s["id"] for s in summaries] == ["newer", "older"]
+        assert summaries[1]["completed_topics"] == 1
+        assert storage.get_curriculum("older")["curriculum"] == curriculum
+        assert storage.get_learning_progress("older")["topics"]["0-0"]["quiz_score"] == 80
     
-    def test_load_all_corrupted_file(self, temp_storage_dir):
-        """Test loading from a corrupted file."""
-        storage._ensure_storage_exists()
-        (temp_storage_dir / "curriculums.json").write_text("not valid json")
+    def test_import_skips_malformed_records(self, temp_storage_dir, sample_curriculum_data, caplog):
+        """Test that malformed legacy records are skipped or defaulted and the database stays usable."""
+        (temp_storage_dir / "curriculums.json").write_text(json.dumps([
+            {"id": "good", "created_at": "2024-12-06T10:00:00", "curriculum": sample_curriculum_data},
+            {"id": "sparse", "curriculum": {"clusters": [{"name": "Only a name"}]}},
+            {"created_at": "2024-12-05T10:00:00"},
+            "not a record",
+        ]))
+        (temp_storage_dir / "progress.json").write_text(json.dumps({
+            "good": {"topics": {"0-0": {"completed": True}, "0-1": "done"}, "last_activity": "2024-12-06T11:00:00"},
+            "listed": {"topics": ["0-0"]},
+            "broken": "not progress"
+        }))
+        
+        with caplog.at_level("INFO", logger="app.storage"):
+            summaries = storage.list_curriculums()
+        
+        assert "Imported 2 curriculums and progress for 1 from JSON files" in caplog.text
+        assert [s["id"] for s in summaries] == ["good", "sparse"]
+        assert summaries[1]["subject"] == ""
+        assert summaries[1]["topic_count"] == 0
+        assert storage.get_learning_progress("good")["started_at"] == "2024-12-06T11:00:00"
+        assert list(storage.get_learning_progress("good")["topics"]) == ["0-0"]
+        assert storage.get_learning_progress("listed") is None
+        assert storage.get_learning_progress("broken") is None
+        # The shared connection is not left inside the import transaction
+        storage.update_topic_progress("good", 0, 1, completed=True, quiz_score=70)
+        assert storage.save_curriculum(sample_curriculum_data)
+    
+    def test_import_skips_progress_file_that_is_not_an_object(self, temp_storage_dir, sample_curriculum_data):
+        """Test that a progress file holding a list is ignored instead of failing every connection."""
+        (temp_storage_dir / "curriculums.json").write_text(json.dumps([
+            {"id": "good", "created_at": "2024-12-06T10:00:00", "curriculum": sample_curriculum_data}
+        ]))
+        (temp_storage_dir / "progress.json").write_text(json.dumps(["good"]))
+        
+        assert [s["id"] for s in storage.list_curriculums()] == ["good"]
+        assert storage.get_learning_progress("good") is None
+    
+    def test_import_failure_rolls_back(self, temp_storage_dir, sample_curriculum_data):
+        """Test that an import error rolls back and is retried on the next connection."""
+        (temp_storage_dir / "curriculums.json").write_text(json.dumps([
+            {"id": "good", "created_at": "2024-12-06T10:00:00", "curriculum": sample_curriculum_data}
+        ]))
         
-        curriculums = storage._load_all()
-        assert curriculums == []
+        with patch("app.storage._insert_curriculum", side_effect=sqlite3.OperationalError("disk I/O error")):
+            with pytest.raises(sqlite3.OperationalError):
+                storage.list_curriculums()
+        
+        assert [s["id"] for s in storage.list_curriculums()] == ["good"]
     
-    def test_load_progress_corrupted_file(self, temp_storage_dir):
-        """Test loading progress from a corrupted file."""
-        storage._ensure_storage_exists()
+    def test_import_empty_file(self, temp_storage_dir):
+        """Test importing from an empty file."""
+        (temp_storage_dir / "curriculums.json").write_text("[]")
+        
+        assert storage.list_curriculums() == []
+    
+    def test_import_corrupted_files(self, temp_storage_dir):
+        """Test that corrupted legacy files are skipped."""
+        (temp_storage_dir / "curriculums.json").write_text("not valid json")
         (temp_storage_dir / "progress.json").write_text("invalid json")
         
-        progress = storage._load_progress()
-        assert progress == {}
+        assert storage.list_curriculums() == []
+        assert storage.get_learning_progress("anything") is None
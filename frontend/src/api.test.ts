@@ -23,6 +23,7 @@ type MockFetchResponse<TJson = unknown> = {
   ok: boolean;
   status: number;
   json?: () => Promise<TJson>;
+  headers?: { get: (name: string) => string | null };
   body?: {
     getReader: () => {
       read: () => Promise<{ done: boolean; value?: Uint8Array }>;
@@ -234,6 +235,20 @@ describe('api.ts', () => {
       expect(onProgress).toHaveBeenNthCalledWith(3, expect.objectContaining({ type: 'complete', generated_count: 2 }));
     });
 
+    it('prepareCurriculumContent reports a JSON complete event when nothing is missing', async () => {
+      const onProgress = vi.fn();
+      const complete = { type: 'complete', generated_count: 0, message: 'All content already prepared' };
+      fetchMock.mockResolvedValueOnce({
+        ...makeJsonResponse(complete),
+        headers: { get: () => 'application/json' },
+      });
+
+      await prepareCurriculumContent('cid', onProgress);
+
+      expect(onProgress).toHaveBeenCalledTimes(1);
+      expect(onProgress).toHaveBeenCalledWith(complete);
+    });
+
     it('prepareCurriculumContent throws on non-ok', async () => {
       fetchMock.mockResolvedValueOnce(makeJsonResponse({}, 400));
       await expect(prepareCurriculumContent('cid', vi.fn()))
@@ -157,6 +157,12 @@ export async function prepareCurriculumContent(
     throw new Error(`HTTP error! status: ${response.status}`);
   }
 
+  // Nothing to prepare: the server answers with the complete event as plain JSON
+  if (response.headers?.get('content-type')?.includes('application/json')) {
+    onProgress(await response.json() as PreparationUpdate);
+    return;
+  }
+
   const reader = response.body?.getReader();
   if (!reader) throw new Error('No response body');
 
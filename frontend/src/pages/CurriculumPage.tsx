@@ -49,7 +49,7 @@ export function CurriculumPage() {
           });
         } else if (update.type === 'batch_complete') {
           // Remove completed items from generating set and update content status
-          const completedBatch = currentBatchRef.current;
+          const completedBatch = update.items ?? currentBatchRef.current;
           setGeneratingItems(prev => {
             const newSet = new Set(prev);
             for (const item of completedBatch) {